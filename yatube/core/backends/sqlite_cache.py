@@ -0,0 +1,267 @@
+"""Кэш в файле SQLite, общий для всех процессов на машине.
+
+В отличие от LocMemCache, запись, сделанная одним процессом, сразу
+видна остальным, поэтому фрагменты страниц строятся один раз на машину,
+а сброс версии ленты доходит до всех процессов. Внешний сервис
+не нужен: файл открывается в режиме WAL, читатели не блокируют
+писателя.
+
+Целые числа хранятся как INTEGER, остальные значения сериализуются
+pickle. incr выполняется в транзакции BEGIN IMMEDIATE и атомарен
+между процессами. Несколько записей можно объединить в одну
+транзакцию блоком atomic().
+
+При превышении MAX_ENTRIES удаляются просроченные записи и
+1 / CULL_FREQUENCY записей, к которым дольше всего не обращались.
+Время обращения обновляется не чаще раза в ACCESS_RESOLUTION секунд,
+чтобы чтение почти никогда не требовало записи.
+
+Значения из файла раскрываются pickle, поэтому файл должен лежать
+в каталоге, куда может писать только пользователь проекта, а не в общем
+/tmp. Отсутствующий каталог создается с правами 0700.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.backends.sqlite_cache.SQLiteCache',
+            'LOCATION': '/var/cache/yatube/cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+ACCESS_RESOLUTION = 1
+# Число записей проверяется не при каждой записи, а раз в CULL_CHECK_EVERY.
+CULL_CHECK_EVERY = 100
+BUSY_TIMEOUT_MS = 5000
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+)
+ALIVE = '(expires IS NULL OR expires > ?)'
+
+
+def encode(value):
+    if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+        return value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def decode(value):
+    if isinstance(value, int):
+        return value
+    return pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        self._local = threading.local()
+        self._sets = 0
+
+    def _connection(self):
+        # Соединение SQLite нельзя передавать между потоками
+        # и наследовать после fork.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, mode=0o700, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=BUSY_TIMEOUT_MS / 1000,
+                isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        """Пишущая транзакция: блокировка берется сразу, поэтому
+        прочитанное внутри не изменится до COMMIT."""
+        connection = self._connection()
+        if connection.in_transaction:
+            # Внутри atomic(): транзакцию завершит внешний блок.
+            yield connection
+            return
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def atomic(self):
+        """Записи внутри блока выполняются одной транзакцией."""
+        return self._transaction()
+
+    def _write(self, statements):
+        """Выполняет [(sql, params), ...] в одной транзакции
+        и возвращает число измененных строк."""
+        with self._transaction() as connection:
+            return sum(
+                connection.execute(sql, params).rowcount
+                for sql, params in statements
+            )
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _read(self, keys):
+        now = time.time()
+        placeholders = ', '.join('?' * len(keys))
+        rows = self._connection().execute(
+            f'SELECT key, value, accessed FROM cache '
+            f'WHERE key IN ({placeholders}) AND {ALIVE}',
+            [*keys, now]
+        ).fetchall()
+        stale = [key for key, _, accessed in rows
+                 if now - accessed > ACCESS_RESOLUTION]
+        if stale:
+            placeholders = ', '.join('?' * len(stale))
+            try:
+                self._write([(
+                    f'UPDATE cache SET accessed = ? '
+                    f'WHERE key IN ({placeholders})',
+                    [now, *stale]
+                )])
+            except sqlite3.OperationalError:
+                # Время обращения нужно только для вытеснения,
+                # из-за занятой базы чтение не должно падать.
+                pass
+        return {key: decode(value) for key, value, _ in rows}
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._read([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        values = {}
+        keys_list = list(keys)
+        # Ограничение SQLite на число параметров запроса.
+        for start in range(0, len(keys_list), 500):
+            values.update(self._read(keys_list[start:start + 500]))
+        return {keys[key]: value for key, value in values.items()}
+
+    def _set_statement(self, key, value, timeout):
+        return (
+            'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?)',
+            [key, encode(value), self.get_backend_timeout(timeout),
+             time.time()]
+        )
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        self._write([self._set_statement(key, value, timeout)])
+        self._maybe_cull()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write([
+            self._set_statement(self._key(key, version), value, timeout)
+            for key, value in data.items()
+        ])
+        self._maybe_cull()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute(
+                f'DELETE FROM cache WHERE key = ? AND NOT {ALIVE}', [key, now])
+            added = connection.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                [key, encode(value), self.get_backend_timeout(timeout), now]
+            ).rowcount == 1
+        self._maybe_cull()
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        return self._write([(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {ALIVE}',
+            [self.get_backend_timeout(timeout), key, time.time()]
+        )]) > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._transaction() as connection:
+            row = connection.execute(
+                f'SELECT value FROM cache WHERE key = ? AND {ALIVE}',
+                [key, time.time()]
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = decode(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                [encode(value), key]
+            )
+        return value
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        self._write(
+            [('DELETE FROM cache WHERE key = ?', [key]) for key in keys])
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._connection().execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {ALIVE}',
+            [key, time.time()]
+        ).fetchone() is not None
+
+    def _maybe_cull(self):
+        self._sets += 1
+        if self._sets % CULL_CHECK_EVERY == 0:
+            self.cull()
+
+    def cull(self):
+        """Удаляет просроченные записи, а если их все равно больше
+        MAX_ENTRIES - давно не читавшиеся."""
+        connection = self._connection()
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', [time.time()])
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        excess = count - self._max_entries
+        limit = excess + (
+            count // self._cull_frequency if self._cull_frequency else count)
+        connection.execute(
+            'DELETE FROM cache WHERE key IN ('
+            ' SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            [limit]
+        )
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
@@ -0,0 +1,329 @@
+"""Двухуровневый кэш: LRU в памяти процесса перед общим кэшем.
+
+Чтение сначала ищет ключ в памяти процесса (L1), затем в общем кэше
+(L2, например SQLiteCache). Найденное в L2 запоминается в L1 не дольше
+чем на L1_TIMEOUT секунд. Запись идет сразу в L2.
+
+Чтобы удаление или смена версии ленты в одном процессе доходили
+до остальных, каждая запись публикует в L2 сообщение об инвалидации:
+номер сообщения берется атомарным incr счетчика, текст - список
+измененных ключей. Если общий кэш умеет atomic(), значение
+и сообщение пишутся в L2 одной транзакцией. Не чаще раза
+в SYNC_INTERVAL секунд процесс читает новые сообщения и удаляет
+эти ключи из L1. Если сообщения пропали
+или их слишком много, L1 очищается целиком. Поэтому устаревшее значение
+живет в L1 не дольше SYNC_INTERVAL.
+
+Значения изменяемых типов хранятся в L1 сериализованными, чтобы
+изменение полученного объекта не меняло кэш. Попадания в каждый
+уровень учитываются в stats() и в профилировании запросов.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.backends.tiered_cache.TieredCache',
+            'LOCATION': 'default',
+            'OPTIONS': {
+                'MAX_ENTRIES': 1000,
+                'L1_TIMEOUT': 5,
+                'SYNC_INTERVAL': 0.5,
+                'SHARED': {
+                    'BACKEND': 'core.backends.sqlite_cache.SQLiteCache',
+                    'LOCATION': '/var/cache/yatube/cache.sqlite3',
+                },
+            },
+        }
+    }
+"""
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+from .. import profiling
+
+COUNTER_KEY = 'tiered:invalidations'
+MESSAGE_KEY = 'tiered:invalidation:{number}'
+# Больше сообщений за одну синхронизацию не читается, L1 очищается.
+MAX_MESSAGES = 500
+IMMUTABLE = (int, float, str, bytes, bool, type(None))
+
+# L1 общий для всех потоков процесса: Django создает
+# свой экземпляр кэша в каждом потоке.
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class LocalTier:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.pid = os.getpid()
+        self.seen = None
+        self.synced = 0
+        # Растет при каждой инвалидации, см. TieredCache._fill.
+        self.epoch = 0
+        self.stats = dict.fromkeys(
+            ('l1_hits', 'l1_misses', 'l2_hits', 'l2_misses'), 0)
+
+    def evict(self, keys=None):
+        with self.lock:
+            if keys is None:
+                self.entries.clear()
+            else:
+                for key in keys:
+                    self.entries.pop(key, None)
+            self.epoch += 1
+
+
+def _local_tier(name):
+    with _tiers_lock:
+        tier = _tiers.get(name)
+        # После fork копия L1 родителя не получает инвалидаций.
+        if tier is None or tier.pid != os.getpid():
+            tier = _tiers[name] = LocalTier()
+        return tier
+
+
+def _pack(value):
+    if type(value) in IMMUTABLE:
+        return False, value
+    return True, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _unpack(packed, data):
+    return pickle.loads(data) if packed else data
+
+
+def _count(stat, tier, amount=1):
+    if not amount:
+        return
+    with tier.lock:
+        tier.stats[stat] += amount
+    recorder = profiling.current()
+    if recorder is not None:
+        recorder.values[stat] += amount
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.name = location
+        self.l1_timeout = options.get('L1_TIMEOUT', 5)
+        self.sync_interval = options.get('SYNC_INTERVAL', 0.5)
+        shared = dict(options['SHARED'])
+        self.shared = import_string(shared.pop('BACKEND'))(
+            shared.pop('LOCATION', ''), shared)
+
+    @property
+    def tier(self):
+        return _local_tier(self.name)
+
+    def stats(self):
+        """Попадания и промахи по уровням в этом процессе."""
+        tier = self.tier
+        with tier.lock:
+            stats = dict(tier.stats)
+        for level in ('l1', 'l2'):
+            lookups = stats[f'{level}_hits'] + stats[f'{level}_misses']
+            stats[f'{level}_hit_ratio'] = (
+                stats[f'{level}_hits'] / lookups if lookups else None)
+        return stats
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _l1_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self.l1_timeout
+        return min(timeout, self.l1_timeout)
+
+    def _store(self, tier, key, value, timeout):
+        if timeout <= 0:
+            return
+        entry = (time.monotonic() + timeout, *_pack(value))
+        with tier.lock:
+            tier.entries[key] = entry
+            tier.entries.move_to_end(key)
+            while len(tier.entries) > self._max_entries:
+                tier.entries.popitem(last=False)
+
+    def _fill(self, tier, epoch, values):
+        """Запоминает прочитанное из L2, если за время чтения
+        не было инвалидаций: иначе в L1 могло бы попасть
+        уже устаревшее значение."""
+        if tier.epoch != epoch:
+            return
+        for key, value in values.items():
+            self._store(tier, key, value, self.l1_timeout)
+
+    def _lookup(self, tier, keys):
+        found = {}
+        now = time.monotonic()
+        with tier.lock:
+            for key in keys:
+                entry = tier.entries.get(key)
+                if entry is None:
+                    continue
+                expires, packed, data = entry
+                if expires <= now:
+                    del tier.entries[key]
+                    continue
+                tier.entries.move_to_end(key)
+                found[key] = (packed, data)
+        return {
+            key: _unpack(packed, data)
+            for key, (packed, data) in found.items()
+        }
+
+    def _sync(self, tier):
+        """Применяет сообщения об инвалидации других процессов."""
+        now = time.monotonic()
+        if now - tier.synced < self.sync_interval:
+            return
+        tier.synced = now
+        current = self.shared.get(COUNTER_KEY)
+        seen, tier.seen = tier.seen, current
+        if current == seen:
+            return
+        if seen is None or current is None or not (
+                0 < current - seen <= MAX_MESSAGES):
+            tier.evict()
+            return
+        messages = self.shared.get_many([
+            MESSAGE_KEY.format(number=number)
+            for number in range(seen + 1, current + 1)
+        ])
+        if len(messages) < current - seen:
+            tier.evict()
+            return
+        tier.evict([key for keys in messages.values() for key in keys])
+
+    def _shared_write(self):
+        atomic = getattr(self.shared, 'atomic', None)
+        return atomic() if atomic else nullcontext()
+
+    def _publish(self, keys):
+        try:
+            number = self.shared.incr(COUNTER_KEY)
+        except ValueError:
+            # Начальный номер больше любого прежнего, поэтому процессы
+            # после вытеснения счетчика очистят L1, а не пропустят
+            # сообщения.
+            self.shared.add(COUNTER_KEY, time.time_ns(), None)
+            number = self.shared.incr(COUNTER_KEY)
+        self.shared.set(
+            MESSAGE_KEY.format(number=number), list(keys),
+            self.sync_interval + self.l1_timeout)
+        tier = self.tier
+        with tier.lock:
+            # Свое сообщение читать незачем, если все предыдущие
+            # уже применены.
+            if tier.seen == number - 1:
+                tier.seen = number
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        tier = self.tier
+        self._sync(tier)
+        values = self._lookup(tier, [key])
+        if key in values:
+            _count('l1_hits', tier)
+            return values[key]
+        _count('l1_misses', tier)
+        epoch = tier.epoch
+        values = self.shared.get_many([key])
+        _count('l2_hits' if values else 'l2_misses', tier)
+        self._fill(tier, epoch, values)
+        return values.get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        tier = self.tier
+        self._sync(tier)
+        values = self._lookup(tier, keys)
+        missing = [key for key in keys if key not in values]
+        _count('l1_hits', tier, len(values))
+        _count('l1_misses', tier, len(missing))
+        if missing:
+            epoch = tier.epoch
+            shared = self.shared.get_many(missing)
+            _count('l2_hits', tier, len(shared))
+            _count('l2_misses', tier, len(missing) - len(shared))
+            self._fill(tier, epoch, shared)
+            values.update(shared)
+        return {keys[key]: value for key, value in values.items()}
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        tier = self.tier
+        self._sync(tier)
+        return bool(self._lookup(tier, [key])) or self.shared.has_key(key)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._shared_write():
+            self.shared.set(key, value, timeout)
+            self.tier.evict([key])
+            self._publish([key])
+        self._store(self.tier, key, value, self._l1_timeout(timeout))
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        data = {self._key(key, version): value for key, value in data.items()}
+        with self._shared_write():
+            failed = self.shared.set_many(data, timeout)
+            self.tier.evict(data)
+            self._publish(data)
+        for key, value in data.items():
+            self._store(self.tier, key, value, self._l1_timeout(timeout))
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._shared_write():
+            added = self.shared.add(key, value, timeout)
+            if added:
+                self.tier.evict([key])
+                self._publish([key])
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(self._key(key, version), timeout)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._shared_write():
+            value = self.shared.incr(key, delta)
+            self.tier.evict([key])
+            self._publish([key])
+        return value
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        with self._shared_write():
+            self.shared.delete_many(keys)
+            self.tier.evict(keys)
+            self._publish(keys)
+
+    def clear(self):
+        self.shared.clear()
+        tier = self.tier
+        tier.evict()
+        # Счетчик сообщений в L2 тоже удален: остальные процессы
+        # заметят это при синхронизации и очистят свой L1.
+        tier.seen = None
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
@@ -0,0 +1,116 @@
+"""Кэширование фрагментов без одновременной перерисовки.
+
+Когда фрагмент устаревает, его перерисовывает только один запрос -
+тот, кто первым взял блокировку (cache.add ключа блокировки). Остальные
+в это время получают прежнее значение. Если значения нет совсем,
+остальные ждут результат до FRAGMENT_LOCK_TIMEOUT секунд.
+
+Значение хранится вместе с версией, сроком свежести и временем
+отрисовки и живет в кэше еще FRAGMENT_STALE_TIMEOUT секунд после
+устаревания. Устаревшим считается значение другой версии (например,
+версии ленты) или с истекшим сроком. Чтобы популярные фрагменты
+не устаревали у всех сразу, значение перерисовывается заранее
+с вероятностью, растущей к концу срока (алгоритм XFetch): чем дольше
+отрисовка, тем раньше.
+
+Если запрос получил устаревшее значение или читает отстающую копию БД
+(см. core.replicas), stale_served() до конца запроса возвращает True:
+такую страницу нельзя класть в кэш страниц и отдавать с валидаторами
+под текущими версиями лент. Фрагменты из отстающей копии в кэш
+не сохраняются.
+"""
+import math
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import replicas
+
+LOCK_KEY = '{key}:lock'
+# Как часто ожидающий запрос проверяет, появилось ли значение.
+WAIT_STEP = 0.05
+
+_request = threading.local()
+
+
+def start_request():
+    _request.stale = False
+
+
+def stale_served():
+    """Выдавались ли в текущем запросе устаревшие фрагменты
+    или данные отстающей копии БД."""
+    return getattr(_request, 'stale', False) or replicas.lagging()
+
+
+def _stale(value):
+    _request.stale = True
+    return value
+
+
+def _recompute_early(expires, duration, beta, now):
+    # random() может вернуть 0, тогда log не определен.
+    return now - duration * beta * math.log(
+        random.random() or 1e-12) >= expires
+
+
+def _render(key, render, timeout, version):
+    started = time.monotonic()
+    value = render()
+    duration = time.monotonic() - started
+    if replicas.lagging():
+        return value
+    cache.set(
+        key, (version, value, time.time() + timeout, duration),
+        timeout + settings.FRAGMENT_STALE_TIMEOUT)
+    return value
+
+
+def _render_locked(key, render, timeout, version):
+    try:
+        return _render(key, render, timeout, version)
+    finally:
+        cache.delete(LOCK_KEY.format(key=key))
+
+
+def _wait(key):
+    """Ждет, пока значение нарисует запрос с блокировкой."""
+    deadline = time.monotonic() + settings.FRAGMENT_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def get_or_render(key, render, timeout, version=None, beta=1.0):
+    """Значение фрагмента key версии version из кэша или render().
+
+    beta > 1 заставляет перерисовывать раньше, 0 - только по истечении
+    timeout.
+    """
+    lock = LOCK_KEY.format(key=key)
+    entry = cache.get(key)
+    if entry is not None:
+        entry_version, value, expires, duration = entry
+        if entry_version == version and not _recompute_early(
+                expires, duration, beta, time.time()):
+            return value
+        if not cache.add(lock, True, settings.FRAGMENT_LOCK_TIMEOUT):
+            # Досрочная перерисовка другим запросом не делает
+            # значение устаревшим.
+            if entry_version != version or expires <= time.time():
+                return _stale(value)
+            return value
+        return _render_locked(key, render, timeout, version)
+    if cache.add(lock, True, settings.FRAGMENT_LOCK_TIMEOUT):
+        return _render_locked(key, render, timeout, version)
+    entry = _wait(key)
+    if entry is not None:
+        return entry[1] if entry[0] == version else _stale(entry[1])
+    # Запрос с блокировкой не успел, рисуем сами.
+    return _render(key, render, timeout, version)
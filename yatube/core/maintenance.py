@@ -0,0 +1,118 @@
+"""Обслуживание файла SQLite без остановки записи.
+
+Каждый шаг короткий и уступает запросам: блокировку записи он ждет
+не дольше BUSY_TIMEOUT_MS и, если база занята, пропускается до
+следующего раза.
+
+- ANALYZE обновляет статистику планировщика. PRAGMA analysis_limit
+  ограничивает число просматриваемых строк каждого индекса, поэтому
+  шаг занимает миллисекунды и на больших таблицах. PRAGMA optimize
+  до SQLite 3.46 смотрит только таблицы, к которым обращалось это же
+  соединение, и в отдельном соединении ничего бы не сделал.
+- incremental_vacuum возвращает файлу освободившиеся после удалений
+  страницы порциями по VACUUM_STEP, пока не выйдет время шага.
+  Работает при auto_vacuum = INCREMENTAL: новые базы создаются так
+  (SQLITE_PRAGMAS), существующие переводит db_maintenance --vacuum.
+- Пассивная контрольная точка переносит WAL в основной файл, не ожидая
+  ни читателей, ни писателей; journal_size_limit затем обрезает WAL.
+
+Запускается командой db_maintenance или, при DB_MAINTENANCE_INTERVAL
+> 0, после запросов в фоновом потоке (core.periodic).
+"""
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+from .periodic import PeriodicTask
+
+# Сколько шаг обслуживания ждет блокировку записи.
+BUSY_TIMEOUT_MS = 50
+ANALYSIS_LIMIT = 1000
+# Сколько страниц освобождает один вызов incremental_vacuum.
+VACUUM_STEP = 256
+AUTO_VACUUM_INCREMENTAL = 2
+# Результат шага, пропущенного из-за занятой базы.
+BUSY = 'busy'
+
+
+def _pragma(cursor, statement):
+    cursor.execute(f'PRAGMA {statement}')
+    return cursor.fetchone()
+
+
+def analyze(cursor, deadline):
+    """Обновляет статистику планировщика."""
+    _pragma(cursor, f'analysis_limit = {ANALYSIS_LIMIT}')
+    cursor.execute('ANALYZE')
+    return True
+
+
+def incremental_vacuum(cursor, deadline):
+    """Число освобожденных страниц или None, если auto_vacuum
+    не INCREMENTAL."""
+    if _pragma(cursor, 'auto_vacuum')[0] != AUTO_VACUUM_INCREMENTAL:
+        return None
+    free = initial = _pragma(cursor, 'freelist_count')[0]
+    while free and time.monotonic() < deadline:
+        # execute освобождает одну страницу за вызов, executescript
+        # выполняет прагму до конца.
+        cursor.executescript(f'PRAGMA incremental_vacuum({VACUUM_STEP})')
+        free = _pragma(cursor, 'freelist_count')[0]
+    return initial - free
+
+
+def checkpoint(cursor, deadline):
+    """Размер WAL в страницах и сколько из них перенесено."""
+    busy, log, checkpointed = _pragma(cursor, 'wal_checkpoint(PASSIVE)')
+    return log, checkpointed
+
+
+TASKS = (
+    ('analyze', analyze),
+    ('vacuum', incremental_vacuum),
+    ('checkpoint', checkpoint),
+)
+
+
+def run(connection, slice_time=None):
+    """Выполняет шаги обслуживания, отводя каждому slice_time секунд.
+    Возвращает {имя шага: результат}."""
+    if connection.vendor != 'sqlite':
+        return {}
+    if slice_time is None:
+        slice_time = settings.DB_MAINTENANCE_SLICE
+    report = {}
+    with connection.cursor() as cursor:
+        busy_timeout = _pragma(cursor, 'busy_timeout')[0]
+        _pragma(cursor, f'busy_timeout = {BUSY_TIMEOUT_MS}')
+        try:
+            for name, task in TASKS:
+                try:
+                    # executescript обходит обертку ошибок Django.
+                    with connection.wrap_database_errors:
+                        report[name] = task(
+                            cursor, time.monotonic() + slice_time)
+                except OperationalError as error:
+                    if 'locked' not in str(error):
+                        raise
+                    report[name] = BUSY
+        finally:
+            _pragma(cursor, f'busy_timeout = {busy_timeout}')
+    return report
+
+
+def vacuum(connection):
+    """Полный VACUUM с переводом на auto_vacuum = INCREMENTAL.
+    Блокирует запись на все время, для окна обслуживания."""
+    with connection.cursor() as cursor:
+        _pragma(cursor, 'auto_vacuum = INCREMENTAL')
+        cursor.execute('VACUUM')
+
+
+def _run_default():
+    run(connections[DEFAULT_DB_ALIAS])
+
+
+task = PeriodicTask(
+    'db-maintenance', _run_default, 'DB_MAINTENANCE_INTERVAL')
@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core import maintenance
+
+
+class Command(BaseCommand):
+    help = ('Обновляет статистику планировщика, освобождает страницы '
+            'и переносит WAL в файл БД короткими шагами')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='Обслуживаемая БД',
+        )
+        parser.add_argument(
+            '--slice',
+            type=float,
+            default=settings.DB_MAINTENANCE_SLICE,
+            help='Сколько секунд может занимать каждый шаг',
+        )
+        parser.add_argument(
+            '--vacuum',
+            action='store_true',
+            help='Сначала выполнить полный VACUUM и перевести БД '
+                 'на auto_vacuum = INCREMENTAL; блокирует запись',
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            self.stdout.write('Обслуживание нужно только SQLite')
+            return
+        if options['vacuum']:
+            maintenance.vacuum(connection)
+            self.stdout.write('VACUUM выполнен')
+        report = maintenance.run(connection, options['slice'])
+        for name, result in report.items():
+            if result == maintenance.BUSY:
+                self.stdout.write(f'{name}: база занята, шаг пропущен')
+            elif name == 'vacuum' and result is None:
+                self.stdout.write(
+                    'vacuum: auto_vacuum не INCREMENTAL, '
+                    'запустите команду с --vacuum')
+            elif name == 'vacuum':
+                self.stdout.write(f'vacuum: освобождено страниц {result}')
+            elif name == 'checkpoint':
+                log, checkpointed = result
+                self.stdout.write(
+                    f'checkpoint: перенесено {checkpointed} '
+                    f'из {log} страниц WAL')
+            else:
+                self.stdout.write(f'{name}: выполнено')
+        self.stdout.write(self.style.SUCCESS('Обслуживание завершено'))
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import profiling, replicas
+
+
+class ProfilingMiddleware:
+    """Замеряет долю запросов, см. core.profiling.
+    При PROFILING_SAMPLE_RATE = 0 не подключается."""
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        profiling.install()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling.should_sample():
+            return self.get_response(request)
+        return profiling.profile(self.get_response, request)
+
+
+class ReplicaMiddleware:
+    """Направляет чтения клиента, который что-то записал, в основную
+    БД, пока копии его не догонят, см. core.replicas. Без
+    DATABASE_REPLICAS не подключается."""
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        replicas.start_request(request)
+        response = self.get_response(request)
+        replicas.finish_request(response)
+        return response
@@ -0,0 +1,59 @@
+"""Фоновые задачи, которые запускаются после запросов.
+
+Задача запускается в отдельном потоке не чаще раза за интервал
+из настроек на все процессы: первый процесс, добавивший в кэш
+блокировку задачи, выполняет ее, остальные пропускают. Интервал 0
+выключает запуск.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = 'periodic:{name}:lock'
+
+
+class PeriodicTask:
+    def __init__(self, name, target, interval_setting):
+        self.name = name
+        self.target = target
+        self.interval_setting = interval_setting
+        self.last_run = None
+        self.thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def lock_key(self):
+        return LOCK_KEY.format(name=self.name)
+
+    def _run(self):
+        try:
+            self.target()
+        except Exception:
+            logger.exception('Фоновая задача %s не выполнена', self.name)
+        finally:
+            # Соединения этого потока.
+            connections.close_all()
+
+    def schedule(self):
+        """Запускает задачу в фоновом потоке, если подошел срок."""
+        interval = getattr(settings, self.interval_setting)
+        if not interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if self.last_run is not None and now - self.last_run < interval:
+                return
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.last_run = now
+            if not cache.add(self.lock_key, True, interval):
+                return
+            self.thread = threading.Thread(
+                target=self._run, name=self.name, daemon=True)
+            self.thread.start()
@@ -0,0 +1,324 @@
+"""Легкое профилирование запросов в боевом режиме.
+
+ProfilingMiddleware замеряет долю запросов PROFILING_SAMPLE_RATE:
+общее время, число и время SQL-запросов, время отрисовки шаблонов,
+попадания и промахи кэша, для TieredCache - и по каждому уровню
+(доли попаданий l1_hit_ratio и l2_hit_ratio). Значения копятся
+в гистограммах по имени адреса (posts:index) в памяти процесса.
+Не чаще раза
+в PROFILING_FLUSH_INTERVAL секунд процесс записывает свои гистограммы
+в отдельный файл каталога PROFILING_DIR; страница статистики
+складывает файлы всех процессов. Файлы завершившихся процессов и не
+обновлявшиеся дольше PROFILING_SNAPSHOT_MAX_AGE секунд при этом
+удаляются. Очистка статистики оставляет в каталоге метку reset,
+увидев которую остальные процессы обнуляют свои гистограммы.
+
+Время шаблонов и обращения к кэшу учитываются через обертки методов
+Template.render и get/get_many классов кэшей, которые ставит install().
+Вне замеряемого запроса обертки только проверяют threading.local.
+"""
+import glob
+import json
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.db import connections
+from django.template.backends.django import Template
+
+# Верхние границы корзин гистограмм: миллисекунды или штуки.
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+METRICS = (
+    'wall_ms', 'sql_count', 'sql_ms', 'template_ms',
+    'cache_hits', 'cache_misses',
+    # Уровни TieredCache.
+    'l1_hits', 'l1_misses', 'l2_hits', 'l2_misses',
+)
+PERCENTILES = (50, 95, 99)
+RESET_MARKER = 'reset'
+
+_local = threading.local()
+_lock = threading.Lock()
+_stats = {}
+_started = time.time()
+_flushed = 0
+_installed = False
+_missing = object()
+
+
+class Histogram:
+    def __init__(self, counts=None, total=0):
+        self.counts = counts or [0] * (len(BUCKETS) + 1)
+        self.total = total
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def add(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.total += value
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+
+    def percentile(self, percent):
+        """Верхняя граница корзины, в которую попадает перцентиль."""
+        rank = self.count * percent / 100
+        seen = 0
+        for bound, count in zip(BUCKETS + (None,), self.counts):
+            seen += count
+            if count and seen >= rank:
+                return bound
+        return None
+
+    def to_dict(self):
+        return {'counts': self.counts, 'total': self.total}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(list(data['counts']), data['total'])
+
+
+class Recorder:
+    """Значения одного замеряемого запроса."""
+
+    def __init__(self):
+        self.values = dict.fromkeys(METRICS, 0)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.values['sql_count'] += 1
+            self.values['sql_ms'] += (time.perf_counter() - started) * 1000
+
+
+def current():
+    return getattr(_local, 'recorder', None)
+
+
+def should_sample():
+    rate = settings.PROFILING_SAMPLE_RATE
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def profile(get_response, request):
+    """Выполняет запрос, записывая его значения."""
+    recorder = Recorder()
+    _local.recorder = recorder
+    started = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = get_response(request)
+    finally:
+        _local.recorder = None
+    recorder.values['wall_ms'] = (time.perf_counter() - started) * 1000
+    match = getattr(request, 'resolver_match', None)
+    record(match.view_name if match else 'unresolved', recorder.values)
+    return response
+
+
+def record(name, values):
+    with _lock:
+        histograms = _stats.setdefault(
+            name, {metric: Histogram() for metric in METRICS})
+        for metric, value in values.items():
+            histograms[metric].add(value)
+    if time.time() - _flushed >= settings.PROFILING_FLUSH_INTERVAL:
+        flush()
+
+
+def _snapshot_path():
+    return os.path.join(
+        settings.PROFILING_DIR, f'{os.getpid()}-{int(_started)}.json')
+
+
+def _reset_at():
+    try:
+        return os.path.getmtime(
+            os.path.join(settings.PROFILING_DIR, RESET_MARKER))
+    except OSError:
+        return 0
+
+
+def flush():
+    """Записывает гистограммы процесса в его файл."""
+    global _flushed, _started
+    reset_at = _reset_at()
+    with _lock:
+        if reset_at > _started:
+            _stats.clear()
+            _started = time.time()
+        data = {
+            name: {
+                metric: histogram.to_dict()
+                for metric, histogram in histograms.items()
+            }
+            for name, histograms in _stats.items()
+        }
+        _flushed = time.time()
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    path = _snapshot_path()
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as snapshot:
+        json.dump(data, snapshot)
+    os.replace(temporary, path)
+
+
+def _process_exists(pid):
+    if os.name != 'posix':
+        # Проверить процесс сигналом 0 можно только в POSIX.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Процесс есть, но принадлежит другому пользователю.
+        return True
+    return True
+
+
+def _is_outdated(path):
+    """Файл завершившегося процесса или давно не обновлявшийся."""
+    try:
+        pid = int(os.path.basename(path).split('-', 1)[0])
+        modified = os.path.getmtime(path)
+    except (ValueError, OSError):
+        return False
+    return (not _process_exists(pid) or time.time() - modified
+            > settings.PROFILING_SNAPSHOT_MAX_AGE)
+
+
+def collect():
+    """Гистограммы всех процессов, сложенные по имени адреса.
+    Устаревшие файлы удаляются."""
+    flush()
+    merged = {}
+    for path in glob.glob(os.path.join(settings.PROFILING_DIR, '*.json')):
+        if _is_outdated(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as snapshot:
+                data = json.load(snapshot)
+        except (OSError, ValueError):
+            continue
+        for name, histograms in data.items():
+            target = merged.setdefault(
+                name, {metric: Histogram() for metric in METRICS})
+            for metric, histogram in histograms.items():
+                target[metric].merge(Histogram.from_dict(histogram))
+    return merged
+
+
+def summary():
+    """Сводка для страницы статистики."""
+    result = {}
+    for name, histograms in sorted(collect().items()):
+        requests = histograms['wall_ms'].count
+        if not requests:
+            continue
+        result[name] = {'requests': requests}
+        for metric, histogram in histograms.items():
+            result[name][metric] = {
+                'mean': round(histogram.total / requests, 2),
+                **{
+                    f'p{percent}': histogram.percentile(percent)
+                    for percent in PERCENTILES
+                },
+            }
+        for level in ('l1', 'l2'):
+            hits = histograms[f'{level}_hits'].total
+            lookups = hits + histograms[f'{level}_misses'].total
+            if lookups:
+                result[name][f'{level}_hit_ratio'] = round(hits / lookups, 3)
+    return result
+
+
+def reset():
+    """Обнуляет статистику всех процессов."""
+    global _started
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    with open(os.path.join(settings.PROFILING_DIR, RESET_MARKER), 'w'):
+        pass
+    with _lock:
+        _stats.clear()
+        _started = time.time()
+    for path in glob.glob(os.path.join(settings.PROFILING_DIR, '*.json')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapper(*args, **kwargs):
+        recorder = current()
+        if recorder is None:
+            return render(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return render(*args, **kwargs)
+        finally:
+            recorder.values['template_ms'] += (
+                time.perf_counter() - started) * 1000
+    return wrapper
+
+
+def _counted_get(get):
+    @wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        recorder = current()
+        if recorder is None:
+            return get(self, key, default, version)
+        value = get(self, key, _missing, version)
+        if value is _missing:
+            recorder.values['cache_misses'] += 1
+            return default
+        recorder.values['cache_hits'] += 1
+        return value
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    @wraps(get_many)
+    def wrapper(self, keys, version=None):
+        keys = list(keys)
+        values = get_many(self, keys, version)
+        recorder = current()
+        if recorder is not None:
+            recorder.values['cache_hits'] += len(values)
+            recorder.values['cache_misses'] += len(keys) - len(values)
+        return values
+    return wrapper
+
+
+def install():
+    """Ставит обертки для учета шаблонов и кэша. Вызывается один раз."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    Template.render = _timed_render(Template.render)
+    for backend in {type(caches[alias]) for alias in settings.CACHES}:
+        backend.get = _counted_get(backend.get)
+        # BaseCache.get_many вызывает get, такие обращения уже учтены.
+        if backend.get_many is not BaseCache.get_many:
+            backend.get_many = _counted_get_many(backend.get_many)
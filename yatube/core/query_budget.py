@@ -0,0 +1,183 @@
+"""Бюджет SQL-запросов страниц.
+
+Число запросов и их суммарное время сравниваются с записанными в файле
+бюджета. При превышении проверка падает с разницей между записанными
+и новыми запросами. С переменной окружения QUERY_BUDGET_UPDATE=1
+проверка не падает, а записывает в файл текущие значения. Время
+запросов зависит от машины и ее загрузки, поэтому проверяется только
+с QUERY_BUDGET_TIME=1.
+
+    with query_budget('posts:index'):
+        client.get(reverse('posts:index'))
+
+То же доступно декоратором @query_budget('posts:index') и фикстурой
+pytest query_budget (подключается через pytest_plugins).
+"""
+import difflib
+import json
+import os
+import re
+import time
+from contextlib import ContextDecorator, ExitStack, contextmanager
+
+from django.db import connections
+
+try:
+    import pytest
+except ImportError:
+    pytest = None
+
+BUDGET_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'query_budgets.json'
+)
+UPDATE_ENV = 'QUERY_BUDGET_UPDATE'
+TIME_ENV = 'QUERY_BUDGET_TIME'
+
+# Время запросов зависит от машины, поэтому в бюджет записывается
+# с запасом и не меньше MIN_TIME секунд.
+TIME_HEADROOM = 10
+MIN_TIME = 0.1
+
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+# Имена точек сохранения Django включают id потока и счетчик.
+SAVEPOINT = re.compile(r'"s\d+_x\d+"')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def normalize(sql):
+    """SQL без значений параметров и имен точек сохранения: запросы
+    сравниваются по форме."""
+    return LITERAL.sub('?', SAVEPOINT.sub('"?"', sql))
+
+
+class QueryRecorder:
+    """Обертка запросов (connection.execute_wrapper), записывающая
+    их так же, как CaptureQueriesContext, но не открывающая
+    соединений с неиспользуемыми базами."""
+
+    def __init__(self):
+        self.captured_queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            connection = context['connection']
+            if many:
+                try:
+                    times = len(params)
+                except TypeError:
+                    times = '?'
+                sql = f'{times} times: {sql}'
+            else:
+                sql = connection.ops.last_executed_query(
+                    context['cursor'], sql, params)
+            self.captured_queries.append({
+                'sql': sql,
+                'time': f'{time.perf_counter() - started:.3f}',
+            })
+
+
+@contextmanager
+def capture_queries(using=None):
+    """Собирает запросы блока к базам using (по умолчанию ко всем:
+    чтения представлений с read_from_replica идут в копию)."""
+    recorder = QueryRecorder()
+    aliases = [using] if using else [conn.alias for conn in connections.all()]
+    with ExitStack() as stack:
+        for alias in aliases:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        yield recorder.captured_queries
+
+
+def load_budgets(path=BUDGET_FILE):
+    try:
+        with open(path, encoding='utf-8') as budget_file:
+            return json.load(budget_file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_budgets(budgets, path=BUDGET_FILE):
+    with open(path, 'w', encoding='utf-8') as budget_file:
+        json.dump(budgets, budget_file, ensure_ascii=False, indent=2,
+                  sort_keys=True)
+        budget_file.write('\n')
+
+
+class query_budget(ContextDecorator):
+    """Проверяет, что запросы внутри блока укладываются в бюджет name."""
+
+    def __init__(self, name, path=BUDGET_FILE, using=None):
+        self.name = name
+        self.path = path
+        self.using = using
+
+    def __enter__(self):
+        self.context = capture_queries(self.using)
+        self.captured_queries = self.context.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        if exc_type is None:
+            self.check()
+        return False
+
+    @property
+    def queries(self):
+        return [
+            normalize(query['sql'])
+            for query in self.captured_queries
+        ]
+
+    @property
+    def time(self):
+        return sum(
+            float(query['time']) for query in self.captured_queries)
+
+    def check(self):
+        budgets = load_budgets(self.path)
+        if os.environ.get(UPDATE_ENV):
+            budgets[self.name] = {
+                'queries': len(self.queries),
+                'time': round(max(self.time * TIME_HEADROOM, MIN_TIME), 3),
+                'sql': self.queries,
+            }
+            save_budgets(budgets, self.path)
+            return
+        budget = budgets.get(self.name)
+        if budget is None:
+            raise QueryBudgetExceeded(
+                f'Для {self.name} нет бюджета запросов в {self.path}. '
+                f'Запишите его, запустив тесты с {UPDATE_ENV}=1'
+            )
+        errors = []
+        if len(self.queries) > budget['queries']:
+            errors.append(
+                f'{self.name}: {len(self.queries)} запросов '
+                f'при бюджете {budget["queries"]}'
+            )
+        if os.environ.get(TIME_ENV) and self.time > budget['time']:
+            errors.append(
+                f'{self.name}: запросы заняли {self.time:.3f} с '
+                f'при бюджете {budget["time"]} с'
+            )
+        if errors:
+            diff = difflib.unified_diff(
+                budget.get('sql', []), self.queries,
+                'бюджет', 'сейчас', lineterm=''
+            )
+            raise QueryBudgetExceeded('\n'.join([*errors, *diff]))
+
+
+if pytest is not None:
+    @pytest.fixture(name='query_budget')
+    def query_budget_fixture(db):
+        """Фикстура: with query_budget('posts:index'): ..."""
+        return query_budget
@@ -0,0 +1,150 @@
+"""Разбор планов запросов SQLite (EXPLAIN QUERY PLAN).
+
+В плане ищутся полные проходы таблицы (SCAN без индекса, а при
+условиях на таблицу - и проход всего индекса) и сортировки во временном
+B-дереве. Для таблицы с такой проблемой предлагается составной индекс:
+сначала столбцы из условий равенства, затем столбцы ORDER BY.
+"""
+import re
+from collections import namedtuple
+
+from django.apps import apps
+
+# Служебные команды, у которых нет плана.
+SKIP = ('SAVEPOINT', 'RELEASE', 'ROLLBACK', 'BEGIN', 'COMMIT', 'PRAGMA')
+
+SCAN_RE = re.compile(
+    r'^SCAN (?:TABLE )?(?P<table>\w+)(?: AS \w+)?'
+    r'(?: USING (?:COVERING )?INDEX (?P<index>\w+))?$')
+TEMP_SORT_RE = re.compile(r'^USE TEMP B-TREE FOR (?P<purpose>.+)$')
+COLUMN = r'"{table}"\."(\w+)"'
+CLAUSE_RE = re.compile(
+    r' (WHERE|ORDER BY|GROUP BY|LIMIT|HAVING) ')
+
+Problem = namedtuple('Problem', 'kind table detail')
+
+
+def explain(connection, sql):
+    """Строки плана запроса sql. Значения могут быть подставлены или
+    заменены на ? (см. core.query_budget.normalize)."""
+    params = None
+    if '?' in sql:
+        params = [None] * sql.count('?')
+        sql = sql.replace('%', '%%').replace('?', '%s')
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def _clauses(sql):
+    """{WHERE: текст, ORDER BY: текст, ...}, вместе с подзапросами."""
+    parts = CLAUSE_RE.split(sql)
+    clauses = {}
+    for name, text in zip(parts[1::2], parts[2::2]):
+        clauses[name] = clauses.get(name, '') + ' ' + text
+    return clauses
+
+
+def _equality_columns(sql, table):
+    where = _clauses(sql).get('WHERE', '')
+    column = COLUMN.format(table=table)
+    return re.findall(column + r' (?:= |IN \()', where)
+
+
+def _order_columns(sql, table):
+    order = _clauses(sql).get('ORDER BY', '')
+    return [
+        (name, direction == 'DESC') for name, direction in re.findall(
+            COLUMN.format(table=table) + r' (ASC|DESC)', order)
+    ]
+
+
+def problems(sql, plan):
+    """Полные проходы и временные сортировки в плане."""
+    found = []
+    for detail in plan:
+        match = SCAN_RE.match(detail)
+        if match and (not match['index']
+                      or _equality_columns(sql, match['table'])):
+            found.append(Problem('scan', match['table'], detail))
+            continue
+        match = TEMP_SORT_RE.match(detail)
+        if match and match['purpose'].endswith('ORDER BY'):
+            tables = re.findall(r'"(\w+)"\."\w+" (?:ASC|DESC)', _clauses(
+                sql).get('ORDER BY', ''))
+            found.append(Problem(
+                'temp sort', tables[0] if tables else None, detail))
+    return found
+
+
+def _model(table):
+    for model in apps.get_models():
+        if model._meta.db_table == table:
+            return model
+    return None
+
+
+def _indexed(connection, table, columns):
+    """Есть ли индекс, начинающийся со столбцов columns."""
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor, table)
+    return any(
+        constraint['index']
+        and constraint['columns'][:len(columns)] == columns
+        for constraint in constraints.values()
+    )
+
+
+def suggest_index(connection, sql, table):
+    """Предлагаемый индекс таблицы для запроса: строка models.Index
+    или CREATE INDEX, если таблица не принадлежит модели. None, если
+    предложить нечего или такой индекс уже есть - тогда мешает форма
+    запроса, например IN по нескольким значениям с сортировкой."""
+    equal = _equality_columns(sql, table)
+    order = [
+        (name, desc) for name, desc in _order_columns(sql, table)
+        if name not in equal
+    ]
+    # Сортировку в одном направлении дает и индекс по возрастанию,
+    # пройденный с конца.
+    if len({desc for name, desc in order}) == 1:
+        order = [(name, False) for name, desc in order]
+    columns = [(name, False) for name in equal] + order
+    # rowid и так в конце каждого индекса.
+    while columns and columns[-1][0] == 'id':
+        columns.pop()
+    if not columns or _indexed(
+            connection, table, [name for name, desc in columns]):
+        return None
+    model = _model(table)
+    if model is None:
+        return 'CREATE INDEX ON {} ({})'.format(table, ', '.join(
+            name + (' DESC' if desc else '') for name, desc in columns))
+    fields = {field.column: field.name
+              for field in model._meta.concrete_fields}
+    return '{}: models.Index(fields=[{}])'.format(
+        model._meta.label, ', '.join(
+            repr(('-' if desc else '') + fields.get(name, name))
+            for name, desc in columns))
+
+
+def analyze(connection, statements):
+    """Планы запросов с проблемами: [(sql, план, проблемы,
+    предложения)]. Служебные команды пропускаются."""
+    report = []
+    for sql in statements:
+        if sql.lstrip().upper().startswith(SKIP):
+            continue
+        plan = explain(connection, sql)
+        found = problems(sql, plan)
+        if not found:
+            continue
+        suggestions = {
+            suggest_index(connection, sql, table)
+            for table in {problem.table for problem in found}
+            if table
+        }
+        suggestions.discard(None)
+        report.append((sql, plan, found, sorted(suggestions)))
+    return report
@@ -0,0 +1,161 @@
+"""Чтение из копий основной БД.
+
+ReplicaRouter направляет чтения представлений, обернутых
+read_from_replica, в одну из копий DATABASE_REPLICAS. Запись и все
+остальные чтения идут в default, как и чтения после записи в том же
+запросе.
+
+Клиент читает свои записи: ReplicaMiddleware запоминает в подписанной
+cookie время последней записи его запроса, и пока ни одна копия
+не снята после этого времени, клиент читает основную БД. Остальные
+посетители продолжают читать копии.
+
+Копия, снятая до последнего изменения лент (feeds.bump отмечает его
+время после фиксации транзакции), отстает: собранное из нее нельзя
+класть в кэш под текущими версиями лент, иначе устаревшая страница
+выдавалась бы всем до следующей записи. Такие запросы отмечаются
+(lagging), и кэш фрагментов, страниц, числа постов лент и ленты
+подписок их результаты не сохраняет.
+
+Копии включаются явно, списком DATABASE_REPLICAS; пока он пуст,
+чтения и записи не обращаются к кэшу за отметками. Для локальной
+проверки копия - файл SQLite, который refresh перезаписывает
+из основной БД через backup API; при REPLICA_REFRESH_INTERVAL > 0 это
+делается в фоне после запросов.
+"""
+import hashlib
+import random
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .periodic import PeriodicTask
+
+WRITTEN_KEY = 'replicas:written'
+SYNCED_KEY = 'replicas:{digest}:synced'
+WRITTEN_COOKIE = 'replica_written'
+COOKIE_SALT = 'core.replicas'
+# Записи, после которых клиенту незачем читать основную БД.
+IGNORED_APPS = ('sessions',)
+
+_state = threading.local()
+
+
+def _synced_key(alias):
+    # По имени файла, а не псевдониму: у тестовой копии оно другое.
+    name = connections[alias].settings_dict['NAME']
+    digest = hashlib.md5(str(name).encode()).hexdigest()
+    return SYNCED_KEY.format(digest=digest)
+
+
+def mark_written():
+    cache.set(WRITTEN_KEY, time.time(), None)
+
+
+def mark_changed():
+    """Отмечает изменение лент, когда транзакция будет зафиксирована."""
+    if settings.DATABASE_REPLICAS:
+        transaction.on_commit(mark_written)
+
+
+def choose_replica(written=0):
+    """Копия, снятая после времени written, и отстает ли она
+    от последнего изменения лент: (alias или None, lagging)."""
+    keys = {_synced_key(alias): alias for alias in settings.DATABASE_REPLICAS}
+    marks = cache.get_many([WRITTEN_KEY, *keys])
+    synced = {
+        alias: marks[key] for key, alias in keys.items()
+        if marks.get(key, -1) >= written
+    }
+    if not synced:
+        return None, False
+    alias = random.choice(list(synced))
+    return alias, synced[alias] < marks.get(WRITTEN_KEY, 0)
+
+
+def lagging():
+    """Читает ли текущий запрос копию, отстающую от изменений лент."""
+    return getattr(_state, 'lagging', False)
+
+
+def read_from_replica(view):
+    """Направляет чтения представления в копию БД, если она снята
+    после последней записи клиента."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        replica = None
+        if settings.DATABASE_REPLICAS:
+            replica, _state.lagging = choose_replica(
+                getattr(_state, 'client_written', 0))
+        _state.replica = replica
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _state.replica = None
+    return wrapper
+
+
+def start_request(request):
+    _state.in_request = True
+    _state.wrote = _state.lagging = False
+    try:
+        _state.client_written = float(request.get_signed_cookie(
+            WRITTEN_COOKIE, 0, salt=COOKIE_SALT))
+    except ValueError:
+        _state.client_written = 0
+
+
+def finish_request(response):
+    """Запоминает в cookie время записи запроса: транзакции
+    представления уже зафиксированы."""
+    if getattr(_state, 'wrote', False):
+        response.set_signed_cookie(
+            WRITTEN_COOKIE, time.time(), salt=COOKIE_SALT, httponly=True)
+    _state.in_request = _state.wrote = _state.lagging = False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if getattr(_state, 'wrote', False):
+            return DEFAULT_DB_ALIAS
+        return getattr(_state, 'replica', None)
+
+    def db_for_write(self, model, **hints):
+        if (getattr(_state, 'in_request', False)
+                and model._meta.app_label not in IGNORED_APPS):
+            # Остальные чтения запроса - из основной БД.
+            _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Во всех базах одни и те же данные.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Таблицы копий переносит refresh вместе с данными.
+        return db not in settings.DATABASE_REPLICAS
+
+
+def refresh(alias):
+    """Перезаписывает копию alias снимком основной БД."""
+    source, target = connections[DEFAULT_DB_ALIAS], connections[alias]
+    if source.settings_dict['NAME'] == target.settings_dict['NAME']:
+        return
+    source.ensure_connection()
+    target.ensure_connection()
+    started = time.time()
+    source.connection.backup(target.connection)
+    cache.set(_synced_key(alias), started, None)
+
+
+def _refresh_all():
+    for alias in settings.DATABASE_REPLICAS:
+        refresh(alias)
+
+
+task = PeriodicTask(
+    'replicas-refresh', _refresh_all, 'REPLICA_REFRESH_INTERVAL')
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from . import fragments, maintenance, replicas
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Настраивает новое соединение с SQLite, см. SQLITE_PRAGMAS."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(request_started)
+def request_started_handler(sender, **kwargs):
+    fragments.start_request()
+
+
+@receiver(request_finished)
+def request_finished_handler(sender, **kwargs):
+    maintenance.task.schedule()
+    replicas.task.schedule()
@@ -0,0 +1,59 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from core import fragments
+
+register = template.Library()
+
+
+class StaleCacheNode(template.Node):
+    def __init__(self, nodelist, expire_time, fragment_name, vary_on,
+                 version):
+        self.nodelist = nodelist
+        self.expire_time = expire_time
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+        self.version = version
+
+    def render(self, context):
+        try:
+            expire_time = int(self.expire_time.resolve(context))
+        except (ValueError, TypeError):
+            raise template.TemplateSyntaxError(
+                f'"stale_cache" tag got a non-integer timeout value: '
+                f'{self.expire_time.var!r}')
+        key = 'stale.' + make_template_fragment_key(
+            self.fragment_name,
+            [var.resolve(context) for var in self.vary_on])
+        version = self.version.resolve(context) if self.version else None
+        return fragments.get_or_render(
+            key, lambda: self.nodelist.render(context), expire_time,
+            version=version)
+
+
+@register.tag
+def stale_cache(parser, token):
+    """Как {% cache %}, но устаревший фрагмент перерисовывает один
+    запрос, а остальные получают прежний, см. core.fragments.
+
+        {% stale_cache 86400 index_page page_obj.number version=version %}
+
+    Версия не входит в ключ: фрагмент прежней версии выдается,
+    пока рисуется новый.
+    """
+    nodelist = parser.parse(('endstale_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    version = None
+    if tokens[-1].startswith('version='):
+        version = parser.compile_filter(tokens.pop()[len('version='):])
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f'{tokens[0]!r} tag requires at least 2 arguments.')
+    return StaleCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]],
+        version,
+    )
@@ -0,0 +1,57 @@
+"""Окружение тестов.
+
+Тесты не должны писать в каталоги рабочего сервера: на время прогона
+файлы кэша SQLite и статистики профилирования переносятся
+во временный каталог, а cache.clear() тестов не очищает рабочий кэш.
+manage.py test делает это через TestRunner, pytest - через фикстуру
+в tests/conftest.py.
+"""
+import copy
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+SQLITE_CACHE = 'core.backends.sqlite_cache.SQLiteCache'
+
+
+def _relocate_caches(directory):
+    """CACHES, в которых файлы SQLiteCache, в том числе общий уровень
+    TieredCache, лежат в directory."""
+    caches = copy.deepcopy(settings.CACHES)
+    for alias, config in caches.items():
+        shared = config.get('OPTIONS', {}).get('SHARED')
+        for name, backend in ((alias, config), (f'{alias}-shared', shared)):
+            if backend and backend['BACKEND'] == SQLITE_CACHE:
+                backend['LOCATION'] = os.path.join(
+                    directory, f'cache-{name}.sqlite3')
+    return caches
+
+
+@contextmanager
+def isolated_files():
+    """Настройки с путями во временном каталоге, который удаляется
+    после выхода."""
+    directory = tempfile.mkdtemp(prefix='yatube-tests-')
+    try:
+        with override_settings(
+                CACHES=_relocate_caches(directory),
+                PROFILING_DIR=os.path.join(directory, 'profiling')):
+            yield directory
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._isolated_files = isolated_files()
+        self._isolated_files.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self._isolated_files.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
@@ -1,4 +1,29 @@
-from django.test import TestCase
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from io import StringIO
+
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import fragments, maintenance, profiling, query_plans
+from core.backends.sqlite_cache import SQLiteCache
+from core.backends.tiered_cache import COUNTER_KEY, MESSAGE_KEY, TieredCache
+from core.profiling import METRICS, Histogram
+from core.query_budget import normalize
+from posts.models import Post, User
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +31,534 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class HistogramTests(SimpleTestCase):
+    def test_percentile_and_merge(self):
+        """Проверяем перцентили гистограммы и сложение гистограмм."""
+        histogram = Histogram()
+        for value in (0.5, 3, 3, 40):
+            histogram.add(value)
+        self.assertEqual(histogram.percentile(50), 5)
+        self.assertEqual(histogram.percentile(99), 50)
+        other = Histogram()
+        other.add(20000)
+        histogram.merge(other)
+        self.assertEqual(histogram.count, 5)
+        self.assertIsNone(histogram.percentile(99))
+
+
+PROFILING_DIR = tempfile.mkdtemp()
+
+
+@override_settings(
+    PROFILING_SAMPLE_RATE=1,
+    PROFILING_FLUSH_INTERVAL=0,
+    PROFILING_DIR=PROFILING_DIR,
+)
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        profiling.reset()
+        shutil.rmtree(PROFILING_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        profiling.reset()
+        self.client = Client()
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def test_request_is_recorded(self):
+        """Проверяем, что для страницы записываются время, SQL-запросы,
+         отрисовка шаблона и обращения к кэшу."""
+        self.client.get(reverse('posts:index'))
+        stats = profiling.summary()['posts:index']
+        self.assertEqual(stats['requests'], 1)
+        self.assertGreater(stats['sql_count']['mean'], 0)
+        self.assertGreater(stats['template_ms']['mean'], 0)
+        self.assertGreater(stats['cache_misses']['mean'], 0)
+        self.client.get(reverse('posts:index'))
+        stats = profiling.summary()['posts:index']
+        self.assertGreater(stats['cache_hits']['mean'], 0)
+        self.assertGreater(stats['l1_hit_ratio'], 0)
+
+    def test_stats_of_other_processes_are_added(self):
+        """Проверяем, что статистика складывается с файлами
+         других процессов."""
+        self.client.get(reverse('posts:index'))
+        other = Histogram()
+        other.add(10)
+        path = os.path.join(PROFILING_DIR, f'{os.getppid()}-1.json')
+        with open(path, 'w') as file:
+            json.dump(
+                {'posts:index': {
+                    metric: other.to_dict() for metric in METRICS}},
+                file
+            )
+        self.assertEqual(profiling.summary()['posts:index']['requests'], 2)
+
+    def test_outdated_snapshots_removed(self):
+        """Проверяем, что файлы завершившихся процессов и давно
+         не обновлявшиеся файлы удаляются."""
+        other = Histogram()
+        other.add(10)
+        finished = multiprocessing.Process(target=time.sleep, args=[0])
+        finished.start()
+        finished.join()
+        paths = [
+            os.path.join(PROFILING_DIR, f'{finished.pid}-1.json'),
+            os.path.join(PROFILING_DIR, f'{os.getppid()}-1.json'),
+        ]
+        for path in paths:
+            with open(path, 'w') as file:
+                json.dump(
+                    {'posts:index': {
+                        metric: other.to_dict() for metric in METRICS}},
+                    file
+                )
+        old = time.time() - settings.PROFILING_SNAPSHOT_MAX_AGE - 1
+        os.utime(paths[1], (old, old))
+        self.assertNotIn('posts:index', profiling.summary())
+        for path in paths:
+            self.assertFalse(os.path.exists(path))
+
+    def test_stats_page_for_staff_only(self):
+        """Проверяем, что статистика доступна только сотрудникам
+         и очищается POST-запросом."""
+        url = reverse('core:profiling_stats')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.get(reverse('posts:index'))
+        response = self.staff_client.get(url)
+        self.assertIn('posts:index', response.json())
+        self.assertEqual(self.staff_client.post(url).status_code, 204)
+        self.assertNotIn('posts:index', profiling.summary())
+
+
+def increment(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_values_shared_between_instances(self):
+        """Проверяем, что запись одного экземпляра видна другому."""
+        other = self.make_cache()
+        self.cache.set('key', {'value': [1, 2]})
+        self.assertEqual(other.get('key'), {'value': [1, 2]})
+        self.cache.set_many({'a': 1, 'b': 'два'})
+        self.assertEqual(
+            other.get_many(['a', 'b', 'c']), {'a': 1, 'b': 'два'})
+        other.delete('a')
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_add_and_expiry(self):
+        """Проверяем add и истечение срока записи."""
+        self.assertTrue(self.cache.add('key', 1, timeout=0.05))
+        self.assertFalse(self.cache.add('key', 2))
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 3))
+        self.assertEqual(self.cache.get('key'), 3)
+
+    def test_incr_is_atomic_across_processes(self):
+        """Проверяем, что параллельные incr из разных процессов
+         не теряют обновлений."""
+        self.cache.set('counter', 0, timeout=None)
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=increment, args=(self.location, 50))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_cull_evicts_least_recently_used(self):
+        """Проверяем, что при переполнении вытесняются записи,
+         которые дольше всего не читали."""
+        cache = self.make_cache(MAX_ENTRIES=10, CULL_FREQUENCY=2)
+        for i in range(10):
+            cache.set(f'key{i}', i)
+        with mock.patch('core.backends.sqlite_cache.ACCESS_RESOLUTION', 0):
+            cache.get('key0')
+        cache.set('key10', 10)
+        cache.cull()
+        self.assertEqual(cache.get('key0'), 0)
+        self.assertIsNone(cache.get('key1'))
+        self.assertEqual(cache.get('key10'), 10)
+
+
+def open_database(path):
+    """Соединение Django с файлом SQLite с настройками основной БД."""
+    database = DatabaseWrapper(
+        {**connections['default'].settings_dict, 'NAME': path}, 'tuning')
+    database.ensure_connection()
+    return database
+
+
+def hold_write_lock(path, locked, release):
+    """Держит незавершенную пишущую транзакцию, пока не выставят release."""
+    database = open_database(path)
+    with database.cursor() as cursor:
+        cursor.execute('BEGIN EXCLUSIVE')
+        cursor.execute("INSERT INTO post (text) VALUES ('новый')")
+        locked.set()
+        release.wait()
+        cursor.execute('COMMIT')
+    database.close()
+
+
+class SQLiteTuningTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'db.sqlite3')
+
+    def read_during_write(self):
+        """Тексты постов, прочитанные, пока другой поток пишет."""
+        reader = open_database(self.path)
+        self.addCleanup(reader.close)
+        with reader.cursor() as cursor:
+            cursor.execute('CREATE TABLE post (text TEXT)')
+            cursor.execute("INSERT INTO post (text) VALUES ('старый')")
+        locked, release = threading.Event(), threading.Event()
+        writer = threading.Thread(
+            target=hold_write_lock, args=(self.path, locked, release))
+        writer.start()
+        self.addCleanup(writer.join)
+        self.addCleanup(release.set)
+        locked.wait()
+        with reader.cursor() as cursor:
+            cursor.execute('SELECT text FROM post')
+            return [text for text, in cursor.fetchall()]
+
+    def test_pragmas_applied(self):
+        """Проверяем, что новое соединение получает прагмы из настроек."""
+        database = open_database(self.path)
+        self.addCleanup(database.close)
+        with database.cursor() as cursor:
+            for name, expected in (
+                    ('journal_mode', 'wal'), ('synchronous', 1),
+                    ('busy_timeout', 20000), ('cache_size', -65536)):
+                cursor.execute(f'PRAGMA {name}')
+                self.assertEqual(cursor.fetchone()[0], expected)
+
+    def test_readers_not_blocked_by_writer(self):
+        """Проверяем, что во время записи читатель сразу получает
+         данные последней завершенной транзакции."""
+        started = time.monotonic()
+        self.assertEqual(self.read_during_write(), ['старый'])
+        self.assertLess(time.monotonic() - started, 1)
+
+    @override_settings(SQLITE_PRAGMAS={
+        'busy_timeout': 100, 'journal_mode': 'DELETE'})
+    def test_readers_blocked_without_wal(self):
+        """Проверяем, что без WAL тот же читатель ждет писателя
+         и получает "database is locked"."""
+        with self.assertRaisesMessage(
+                OperationalError, 'database is locked'):
+            self.read_during_write()
+
+
+class MaintenanceTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'db.sqlite3')
+        self.database = open_database(self.path)
+        self.addCleanup(self.database.close)
+        with self.database.cursor() as cursor:
+            cursor.execute('CREATE TABLE post (text TEXT)')
+            cursor.executemany(
+                'INSERT INTO post (text) VALUES (%s)',
+                [('пост' * 1000,)] * 200)
+            cursor.execute('DELETE FROM post')
+
+    def pragma(self, name):
+        with self.database.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_frees_pages_and_checkpoints(self):
+        """Проверяем, что обслуживание освобождает страницы удаленных
+         строк, переносит WAL и собирает статистику."""
+        freelist = self.pragma('freelist_count')
+        self.assertGreater(freelist, maintenance.VACUUM_STEP)
+        report = maintenance.run(self.database, slice_time=5)
+        # Страницу из освободившихся мог занять ANALYZE.
+        self.assertGreaterEqual(report['vacuum'], freelist - 1)
+        self.assertEqual(self.pragma('freelist_count'), 0)
+        log, checkpointed = report['checkpoint']
+        self.assertEqual(log, checkpointed)
+        with self.database.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM sqlite_stat1')
+
+    def test_vacuum_stops_at_deadline(self):
+        """Проверяем, что освобождение страниц прерывается по времени."""
+        freelist = self.pragma('freelist_count')
+        report = maintenance.run(self.database, slice_time=0)
+        self.assertEqual(report['vacuum'], 0)
+        self.assertGreaterEqual(self.pragma('freelist_count'), freelist - 1)
+
+    def test_busy_database_skipped(self):
+        """Проверяем, что при занятой базе шаги записи пропускаются,
+         не дожидаясь писателя."""
+        locked, release = threading.Event(), threading.Event()
+        writer = threading.Thread(
+            target=hold_write_lock, args=(self.path, locked, release))
+        writer.start()
+        self.addCleanup(writer.join)
+        self.addCleanup(release.set)
+        locked.wait()
+        started = time.monotonic()
+        report = maintenance.run(self.database, slice_time=5)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(report['analyze'], maintenance.BUSY)
+        self.assertEqual(report['vacuum'], maintenance.BUSY)
+        self.assertEqual(self.pragma('busy_timeout'), 20000)
+
+    @override_settings(DB_MAINTENANCE_INTERVAL=60)
+    def test_scheduled_once_per_interval(self):
+        """Проверяем, что после запросов обслуживание запускается
+         в фоне не чаще раза за интервал."""
+        task = maintenance.task
+        cache.delete(task.lock_key)
+        with mock.patch.object(task, 'last_run', None), \
+                mock.patch.object(maintenance, 'run') as run:
+            task.schedule()
+            task.thread.join()
+            task.schedule()
+            task.thread.join()
+        run.assert_called_once()
+
+    def test_command(self):
+        """Проверяем команду db_maintenance."""
+        stdout = StringIO()
+        with mock.patch('core.management.commands.db_maintenance'
+                        '.connections', {'default': self.database}):
+            call_command('db_maintenance', stdout=stdout)
+        self.assertIn('Обслуживание завершено', stdout.getvalue())
+
+
+class QueryPlansTests(TestCase):
+    def sql(self, queryset):
+        with CaptureQueriesContext(connection) as queries:
+            list(queryset)
+        return queries[-1]['sql']
+
+    def analyze(self, queryset):
+        return query_plans.analyze(connection, [self.sql(queryset)])
+
+    def test_indexed_feed_has_no_problems(self):
+        """Проверяем, что лента автора выбирается по индексу."""
+        self.assertEqual(
+            self.analyze(Post.objects.filter(author_id=1)[:10]), [])
+
+    def test_problems_and_suggestions(self):
+        """Проверяем, что сортировка и проход без индекса находятся,
+         а предложенный индекс начинается с условий равенства."""
+        [(sql, plan, found, suggestions)] = self.analyze(
+            Post.objects.filter(author_id=1).order_by('-comments_count'))
+        self.assertEqual(
+            [problem.kind for problem in found], ['temp sort'])
+        self.assertEqual(suggestions, [
+            "posts.Post: models.Index(fields=['author', 'comments_count'])"
+        ])
+        [(sql, plan, found, suggestions)] = self.analyze(
+            Post.objects.filter(text='пост').order_by())
+        self.assertEqual(
+            [(problem.kind, problem.table) for problem in found],
+            [('scan', 'posts_post')])
+        self.assertEqual(
+            suggestions, ["posts.Post: models.Index(fields=['text'])"])
+
+    def test_placeholders(self):
+        """Проверяем разбор запросов из файла бюджета, без значений."""
+        sql = normalize(self.sql(
+            Post.objects.filter(group_id=1).order_by('-created', '-pk')))
+        self.assertIn('?', sql)
+        self.assertEqual(query_plans.analyze(connection, [sql]), [])
+
+
+class TestFilesTests(SimpleTestCase):
+    def test_tests_use_own_files(self):
+        """Проверяем, что тесты пишут кэш и статистику профилирования
+         во временный каталог, а не в каталог проекта."""
+        for path in (cache.shared.path, settings.PROFILING_DIR):
+            with self.subTest(path=path):
+                self.assertFalse(path.startswith(settings.BASE_DIR))
+                self.assertIn('yatube-tests-', path)
+
+
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = os.path.join(directory.name, 'cache.sqlite3')
+        # Разные имена - разные L1, как в двух процессах.
+        self.first = self.make_cache('first')
+        self.second = self.make_cache('second')
+
+    def make_cache(self, name):
+        return TieredCache(f'{self.id()}:{name}', {'OPTIONS': {
+            'SYNC_INTERVAL': 0,
+            'SHARED': {
+                'BACKEND': 'core.backends.sqlite_cache.SQLiteCache',
+                'LOCATION': self.location,
+            },
+        }})
+
+    def test_second_read_served_from_memory(self):
+        """Проверяем, что повторное чтение не обращается к L2
+         и считается по уровням."""
+        self.first.set('key', 'value')
+        self.assertEqual(self.second.get('key'), 'value')
+        with mock.patch.object(self.second.shared, 'get_many') as shared:
+            self.assertEqual(self.second.get('key'), 'value')
+        shared.assert_not_called()
+        self.assertIsNone(self.second.get('missing'))
+        stats = self.second.stats()
+        self.assertEqual(stats['l1_hits'], 1)
+        self.assertEqual(stats['l2_hits'], 1)
+        self.assertEqual(stats['l2_misses'], 1)
+        self.assertEqual(stats['l1_hit_ratio'], 1 / 3)
+
+    def test_writes_evict_other_processes(self):
+        """Проверяем, что запись, incr, удаление и очистка в одном
+         процессе убирают значение из L1 другого."""
+        self.first.set('key', 1)
+        self.assertEqual(self.second.get('key'), 1)
+        self.first.set('key', 2)
+        self.assertEqual(self.second.get('key'), 2)
+        self.first.incr('key')
+        self.assertEqual(self.second.get('key'), 3)
+        self.first.delete('key')
+        self.assertIsNone(self.second.get('key'))
+        self.first.set('key', 4)
+        self.assertEqual(self.second.get('key'), 4)
+        self.first.clear()
+        self.assertIsNone(self.second.get('key'))
+
+    def test_lost_messages_clear_memory(self):
+        """Проверяем, что при пропавших сообщениях L1 очищается
+         целиком."""
+        self.first.set('key', 1)
+        self.assertEqual(self.second.get('key'), 1)
+        self.first.set('key', 2)
+        shared = self.first.shared
+        shared.delete(MESSAGE_KEY.format(number=shared.get(COUNTER_KEY)))
+        self.assertEqual(self.second.get('key'), 2)
+
+    def test_write_is_single_transaction(self):
+        """Проверяем, что значение и сообщение об инвалидации пишутся
+         в L2 одной транзакцией, в том числе первое сообщение."""
+        statements = []
+        self.first.shared._connection().set_trace_callback(
+            statements.append)
+        writes = (
+            lambda: self.first.set('key', 1),
+            lambda: self.first.incr('key'),
+            lambda: self.first.add('other', 1),
+            lambda: self.first.set_many({'key': 1, 'other': 2}),
+            lambda: self.first.delete('key'),
+        )
+        for write in writes:
+            statements.clear()
+            write()
+            self.assertEqual(statements.count('BEGIN IMMEDIATE'), 1)
+            self.assertEqual(statements.count('COMMIT'), 1)
+        self.assertEqual(self.second.get('other'), 2)
+
+    def test_cached_objects_are_copies(self):
+        """Проверяем, что изменение полученного объекта
+         не меняет кэш."""
+        self.first.set('key', [1, 2])
+        self.first.get('key').append(3)
+        self.assertEqual(self.first.get('key'), [1, 2])
+
+
+class FragmentTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.renders = 0
+
+    def render(self, value='fragment', delay=0):
+        def render():
+            self.renders += 1
+            time.sleep(delay)
+            return value
+        return render
+
+    def test_fresh_value_not_rendered(self):
+        """Проверяем, что свежий фрагмент берется из кэша."""
+        for _ in range(3):
+            self.assertEqual(
+                fragments.get_or_render('key', self.render(), 60),
+                'fragment')
+        self.assertEqual(self.renders, 1)
+
+    def test_stale_value_while_rendering(self):
+        """Проверяем, что пока другой запрос рисует новую версию,
+         выдается прежняя (и запрос помечается), а затем - новая."""
+        fragments.get_or_render('key', self.render('old'), 60, version=1)
+        lock = fragments.LOCK_KEY.format(key='key')
+        cache.add(lock, True)
+        fragments.start_request()
+        self.assertEqual(
+            fragments.get_or_render('key', self.render('new'), 60, 2),
+            'old')
+        self.assertTrue(fragments.stale_served())
+        fragments.start_request()
+        cache.delete(lock)
+        self.assertEqual(
+            fragments.get_or_render('key', self.render('new'), 60, 2),
+            'new')
+        self.assertEqual(self.renders, 2)
+
+    def test_concurrent_misses_render_once(self):
+        """Проверяем, что одновременные промахи рисуют фрагмент
+         один раз."""
+        results = []
+        render = self.render(delay=0.2)
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                fragments.get_or_render('key', render, 60)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['fragment'] * 5)
+        self.assertEqual(self.renders, 1)
+
+    def test_early_recomputation(self):
+        """Проверяем, что фрагмент может перерисовываться до истечения
+         срока, но не при beta = 0."""
+        fragments.get_or_render('key', self.render(delay=0.01), 1)
+        with mock.patch('random.random', return_value=1e-100):
+            fragments.get_or_render('key', self.render(), 1, beta=0)
+            self.assertEqual(self.renders, 1)
+            fragments.get_or_render('key', self.render(), 1)
+            self.assertEqual(self.renders, 2)
@@ -1,4 +1,9 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
+from django.views.decorators.http import require_http_methods
+
+from . import profiling
 
 
 def page_not_found(request, exception):
@@ -15,3 +20,14 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+@require_http_methods(['GET', 'POST'])
+def profiling_stats(request):
+    """Статистика профилирования запросов. POST очищает ее."""
+    if request.method == 'POST':
+        profiling.reset()
+        return HttpResponse(status=204)
+    return JsonResponse(
+        profiling.summary(), json_dumps_params={'ensure_ascii': False})
@@ -1,27 +1,49 @@
 from django.contrib import admin
+from django.core.exceptions import ImproperlyConfigured
 
+from . import fulltext
 from .models import Comment, Follow, Group, Post
 
 
-class PostAdmin(admin.ModelAdmin):
-    list_display = ("pk", "text", "created", "author", "group",)
+class FullTextSearchMixin:
+    """Поиск по полнотекстовому индексу вместо LIKE по search_fields.
+    search_function - функция из posts.fulltext, возвращающая id
+    найденных записей."""
+    search_function = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if self.search_function is None:
+            raise ImproperlyConfigured(
+                f'В {type(self).__name__} не задана search_function')
+        if not search_term or not fulltext.is_available():
+            return super().get_search_results(
+                request, queryset, search_term)
+        ids = self.search_function(search_term)
+        return queryset.filter(pk__in=ids), False
+
+
+class PostAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    list_display = ("pk", "text", "created", "author", "group",
+                    "comments_count",)
     list_editable = ("group",)
     search_fields = ("text",)
     list_filter = ("created",)
     empty_value_display = "-пусто-"
+    search_function = staticmethod(fulltext.search_post_ids)
 
 
 class GroupAdmin(admin.ModelAdmin):
-    list_display = ("title", "slug", "description",)
+    list_display = ("title", "slug", "description", "posts_count",)
     search_fields = ("title",)
     empty_value_display = "-пусто-"
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ("text", "created", "author",)
     search_fields = ("text",)
     list_filter = ("created",)
     empty_value_display = "-пусто-"
+    search_function = staticmethod(fulltext.search_comment_ids)
 
 
 class FollowAdmin(admin.ModelAdmin):
@@ -0,0 +1,257 @@
+"""Нагрузочный прогон страниц posts на заполненной базе.
+
+Каждый сценарий - запрос к одной странице. Клиенты работают
+в отдельных потоках, у каждого свое соединение с БД. Часть клиентов
+анонимные, их запросы проходят через кэш страниц, остальные входят
+пользователями, у которых есть подписки. Сценарии, недоступные без
+входа, выполняют только вошедшие клиенты. Для каждой страницы считаются
+пропускная способность, перцентили времени ответа, число SQL-запросов
+и размер ответа. Сценарии post_create и add_comment пишут в базу.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.db import DatabaseError, connections
+from django.test import Client
+from django.urls import reverse
+
+from core.query_budget import capture_queries, normalize
+
+from .models import Follow, Group, Post, User
+
+# Адрес не из INTERNAL_IPS, чтобы не выводилась панель отладки.
+CLIENT_ADDRESS = '192.0.2.1'
+CLIENT_HOST = 'localhost'
+
+PERCENTILES = (50, 95, 99)
+
+# Отмечает потоки, выполняющие запросы прогона.
+_run_thread = threading.local()
+
+
+class Targets:
+    """Случайные существующие посты, группы и пользователи."""
+
+    def __init__(self, rng, sample_size=1000):
+        self.rng = rng
+        self.post_ids = self.sample(Post.objects.all(), sample_size)
+        self.group_slugs = self.sample(
+            Group.objects.all(), sample_size, 'slug')
+        self.usernames = self.sample(User.objects.all(), sample_size,
+                                     'username')
+        self.reader_ids = self.sample(
+            User.objects.filter(
+                pk__in=Follow.objects.values('user')), sample_size)
+        if not (self.post_ids and self.group_slugs and self.reader_ids):
+            raise ValueError(
+                'Нужны посты, группы и подписки: заполните базу '
+                'командой seed_yatube')
+
+    def sample(self, queryset, size, field='pk'):
+        """Выборка без ORDER BY RANDOM(): по случайному сдвигу в id."""
+        ids = queryset.order_by('pk').values_list(field, flat=True)
+        total = queryset.count()
+        if total <= size:
+            return list(ids)
+        start = self.rng.randrange(total - size)
+        return list(ids[start:start + size])
+
+    def post_id(self):
+        return self.rng.choice(self.post_ids)
+
+
+SCENARIOS = {
+    'index': lambda targets: ('get', reverse('posts:index'), None),
+    'group_posts': lambda targets: ('get', reverse(
+        'posts:group_list', args=[targets.rng.choice(targets.group_slugs)]),
+        None),
+    'profile': lambda targets: ('get', reverse(
+        'posts:profile', args=[targets.rng.choice(targets.usernames)]),
+        None),
+    'post_detail': lambda targets: ('get', reverse(
+        'posts:post_detail', args=[targets.post_id()]), None),
+    'follow_index': lambda targets: (
+        'get', reverse('posts:follow_index'), None),
+    'post_create': lambda targets: ('post', reverse('posts:post_create'), {
+        'text': f'Пост нагрузочного теста {targets.rng.random()}'}),
+    'add_comment': lambda targets: ('post', reverse(
+        'posts:add_comment', args=[targets.post_id()]), {
+        'text': f'Комментарий нагрузочного теста {targets.rng.random()}'}),
+}
+# Сценарии, которые пишут в базу.
+WRITE_SCENARIOS = ('post_create', 'add_comment')
+READ_SCENARIOS = [name for name in SCENARIOS if name not in WRITE_SCENARIOS]
+# Сценарии, которые требуют входа.
+LOGIN_SCENARIOS = ('follow_index', *WRITE_SCENARIOS)
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[rank - 1]
+
+
+class Worker:
+    """Клиент прогона: без reader_id - анонимный посетитель."""
+
+    def __init__(self, reader_id=None):
+        self.client = Client(
+            REMOTE_ADDR=CLIENT_ADDRESS, HTTP_HOST=CLIENT_HOST)
+        self.anonymous = reader_id is None
+        if not self.anonymous:
+            self.client.force_login(User.objects.get(pk=reader_id))
+
+    def request(self, method, url, data):
+        with capture_queries() as queries:
+            started = time.perf_counter()
+            try:
+                response = getattr(self.client, method)(url, data)
+            except DatabaseError:
+                # Например, база занята другим пишущим клиентом.
+                response = None
+            elapsed = time.perf_counter() - started
+        return {
+            'time': elapsed,
+            'queries': len(queries),
+            'bytes': len(response.content) if response else 0,
+            'ok': response is not None and response.status_code < 400,
+        }
+
+
+def summarize(samples, wall_time):
+    times = [sample['time'] for sample in samples]
+    return {
+        'requests': len(samples),
+        'errors': sum(not sample['ok'] for sample in samples),
+        'throughput': round(len(samples) / wall_time, 2),
+        **{
+            f'p{percent}_ms': round(percentile(times, percent) * 1000, 2)
+            for percent in PERCENTILES
+        },
+        'queries_per_request': round(
+            sum(sample['queries'] for sample in samples) / len(samples), 2),
+        'bytes_per_response': round(
+            sum(sample['bytes'] for sample in samples) / len(samples)),
+    }
+
+
+class RunThreadsFilter(logging.Filter):
+    """Отбрасывает записи, сделанные в потоках прогона."""
+
+    def filter(self, record):
+        return not getattr(_run_thread, 'active', False)
+
+
+@contextmanager
+def _in_run():
+    _run_thread.active = True
+    try:
+        yield
+    finally:
+        _run_thread.active = False
+
+
+@contextmanager
+def quiet_request_errors():
+    """Ошибки ответов считаются в сводке, их трассировки не выводятся.
+    Записи об ошибках других потоков процесса не затрагиваются."""
+    logger = logging.getLogger('django.request')
+    log_filter = RunThreadsFilter()
+    logger.addFilter(log_filter)
+    try:
+        with _in_run():
+            yield
+    finally:
+        logger.removeFilter(log_filter)
+
+
+def capture(scenarios, requests=20, seed=0):
+    """SQL-запросы сценариев без повторов: {имя: [sql, ...]}.
+    Запросы одной формы с разными значениями считаются повтором."""
+    rng = random.Random(seed)
+    targets = Targets(rng)
+    worker = Worker(rng.choice(targets.reader_ids))
+    statements = {}
+    with quiet_request_errors():
+        for name in scenarios:
+            seen = statements.setdefault(name, {})
+            for _ in range(requests):
+                method, url, data = SCENARIOS[name](targets)
+                with capture_queries() as queries:
+                    getattr(worker.client, method)(url, data)
+                for query in queries:
+                    seen.setdefault(normalize(query['sql']), query['sql'])
+    return {name: list(seen.values()) for name, seen in statements.items()}
+
+
+def _run_clients(workers, jobs):
+    """Выполняет запросы jobs клиентами workers, каждым в своем потоке.
+    Соединения потока с БД закрываются, когда запросы кончаются."""
+    lock = threading.Lock()
+    samples = []
+
+    def serve(worker):
+        with _in_run():
+            try:
+                while True:
+                    with lock:
+                        job = next(jobs, None)
+                    if job is None:
+                        return
+                    samples.append(worker.request(*job))
+            finally:
+                connections.close_all()
+
+    with ThreadPoolExecutor(len(workers)) as pool:
+        for future in [pool.submit(serve, worker) for worker in workers]:
+            future.result()
+    return samples
+
+
+def run(scenarios, clients=4, requests=200, warmup=10, seed=0,
+        anonymous=None):
+    """Прогоняет сценарии по очереди и возвращает сводку по каждому.
+    anonymous клиентов из clients не входят на сайт, по умолчанию
+    половина."""
+    if anonymous is None:
+        anonymous = clients // 2
+    if clients < 1 or requests < 1 or warmup < 0:
+        raise ValueError(
+            'Нужны хотя бы один клиент и один замеряемый запрос, '
+            'число прогревочных запросов не может быть отрицательным')
+    if not 0 <= anonymous <= clients:
+        raise ValueError(
+            'Число анонимных клиентов должно быть от 0 до числа клиентов')
+    if anonymous == clients and set(scenarios) & set(LOGIN_SCENARIOS):
+        raise ValueError(
+            'Сценариям ' + ', '.join(LOGIN_SCENARIOS)
+            + ' нужен хотя бы один вошедший клиент')
+    rng = random.Random(seed)
+    targets = Targets(rng)
+    workers = [Worker() for _ in range(anonymous)] + [
+        Worker(rng.choice(targets.reader_ids))
+        for _ in range(clients - anonymous)]
+
+    def jobs(name, count):
+        return (SCENARIOS[name](targets) for _ in range(count))
+
+    results = {}
+    with quiet_request_errors():
+        for name in scenarios:
+            active = workers
+            if name in LOGIN_SCENARIOS:
+                active = [
+                    worker for worker in workers if not worker.anonymous]
+            _run_clients(active, jobs(name, warmup))
+            started = time.perf_counter()
+            samples = _run_clients(active, jobs(name, requests))
+            results[name] = summarize(
+                samples, time.perf_counter() - started)
+    return results
@@ -0,0 +1,71 @@
+"""Денормализованные счетчики постов, комментариев и подписок.
+
+Счетчики обновляются атомарными UPDATE ... SET field = field + 1
+в той же транзакции, что и запись, которую они считают.
+"""
+from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+# (модель со счетчиком, поле счетчика, считаемая модель, внешний ключ)
+COUNTERS = (
+    (UserStats, 'posts_count', Post, 'author'),
+    (UserStats, 'followers_count', Follow, 'author'),
+    (UserStats, 'following_count', Follow, 'user'),
+    (Post, 'comments_count', Comment, 'post'),
+    (Group, 'posts_count', Post, 'group'),
+)
+
+
+def change(model, pk, field, delta, **values):
+    """Изменяет счетчик на delta. Счетчик не уходит ниже нуля.
+    values - другие поля, которые записываются тем же запросом."""
+    if pk is None:
+        return
+    rows = model.objects.filter(pk=pk)
+    counter = F(field) + delta
+    if delta < 0:
+        counter = Greatest(counter, 0)
+    rows.update(**{field: counter}, **values)
+
+
+def actual_count(source, fk):
+    """Выражение с фактическим числом записей source для OuterRef('pk')."""
+    return Coalesce(
+        Subquery(
+            source.objects.filter(**{fk: OuterRef('pk')}).order_by().values(
+                fk).annotate(total=Count('pk')).values('total'),
+            output_field=models.IntegerField()
+        ),
+        0
+    )
+
+
+def missing_stats():
+    """Пользователи без строки счетчиков."""
+    return User.objects.filter(stats__isnull=True)
+
+
+def find_mismatches():
+    """Возвращает расхождения счетчиков с фактическими данными:
+    (модель, pk, поле, значение счетчика, фактическое значение)."""
+    mismatches = []
+    for model, field, source, fk in COUNTERS:
+        rows = model.objects.annotate(
+            actual=actual_count(source, fk)
+        ).exclude(**{field: F('actual')}).values_list('pk', field, 'actual')
+        mismatches.extend(
+            (model, pk, field, stored, actual)
+            for pk, stored, actual in rows
+        )
+    return mismatches
+
+
+def rebuild():
+    """Пересчитывает все счетчики по фактическим данным."""
+    UserStats.objects.bulk_create(
+        [UserStats(user=user) for user in missing_stats()])
+    for model, field, source, fk in COUNTERS:
+        model.objects.update(**{field: actual_count(source, fk)})
@@ -0,0 +1,103 @@
+"""Версии лент для кэширования страниц.
+
+Каждая лента (главная, группа, профиль автора, пост) имеет счетчик
+поколений в кэше. Версия входит в ключ кэшированного фрагмента, поэтому
+после изменения данных достаточно увеличить версию затронутых лент:
+старые фрагменты больше не читаются и вытесняются по TTL.
+"""
+import time
+
+from django.core.cache import cache
+
+from core import replicas
+
+FEED_VERSION_KEY = 'feed_version:{feed}'
+FEED_COUNT_KEY = 'feed_count:{feed}:{version}'
+COUNT_TIMEOUT = 60 * 60 * 24
+INDEX = 'index'
+
+
+def feed_name(*parts):
+    return ':'.join(str(part) for part in parts)
+
+
+def group_feed(group_id):
+    return feed_name('group', group_id)
+
+
+def profile_feed(author_id):
+    return feed_name('profile', author_id)
+
+
+def post_feed(post_id):
+    return feed_name('post', post_id)
+
+
+def followers_feed(author_id):
+    """Подписчики автора: меняется число подписчиков в профиле."""
+    return feed_name('followers', author_id)
+
+
+def _key(feed):
+    return FEED_VERSION_KEY.format(feed=feed)
+
+
+def _initial_version():
+    # Версия после вытеснения счетчика не должна совпасть
+    # ни с одной из прежних версий.
+    return time.time_ns()
+
+
+def get_version(feed):
+    """Текущая версия ленты."""
+    version = cache.get(_key(feed))
+    if version is None:
+        cache.add(_key(feed), _initial_version(), None)
+        version = cache.get(_key(feed))
+    return version
+
+
+def get_versions(feeds):
+    """Текущие версии нескольких лент за одно обращение к кэшу."""
+    keys = {_key(feed): feed for feed in feeds}
+    versions = {
+        keys[key]: version for key, version in cache.get_many(keys).items()
+    }
+    for feed in keys.values():
+        if feed not in versions:
+            versions[feed] = get_version(feed)
+    return versions
+
+
+def bump(*feeds):
+    """Увеличивает версии лент, делая их кэш недействительным."""
+    for feed in set(feeds):
+        try:
+            cache.incr(_key(feed))
+        except ValueError:
+            cache.set(_key(feed), _initial_version(), None)
+    # Копии, снятые раньше, отстают от новых версий.
+    replicas.mark_changed()
+
+
+def get_count(feed, count):
+    """Число записей ленты из кэша. Ключ включает версию ленты,
+    поэтому посчитанное значение сбрасывается при каждом изменении
+    ленты; count() вызывается только при промахе."""
+    key = FEED_COUNT_KEY.format(feed=feed, version=get_version(feed))
+    total = cache.get(key)
+    if total is None:
+        total = count()
+        if not replicas.lagging():
+            cache.set(key, total, COUNT_TIMEOUT)
+    return total
+
+
+def post_feeds(post, group_ids=()):
+    """Ленты, в которых выводится пост."""
+    feeds = [INDEX, profile_feed(post.author_id), post_feed(post.pk)]
+    feeds.extend(
+        group_feed(group_id)
+        for group_id in (post.group_id, *group_ids) if group_id is not None
+    )
+    return feeds
@@ -0,0 +1,130 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Индекс хранится в виртуальных таблицах SQLite FTS5. В индекс пишутся
+не исходные тексты, а основы слов (см. posts.stemmer), поэтому поиск
+находит разные словоформы. Индекс обновляется сигналами моделей;
+записи, созданные в обход моделей (bulk_create, update),
+индексируются командой rebuild_search_index.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+
+from .stemmer import stem
+
+# Таблицы создает миграция 0013_search_index.
+POST_TABLE = 'posts_post_fts'
+COMMENT_TABLE = 'posts_comment_fts'
+
+# Совпадение в комментарии весит меньше совпадения в тексте поста.
+COMMENT_WEIGHT = 0.5
+
+WORD = re.compile(r'(\w+)(\*?)')
+
+
+def is_available(using=None):
+    """Индекс поддерживается только в SQLite."""
+    return (using or connection).vendor == 'sqlite'
+
+
+def normalize(text):
+    """Текст в виде основ слов через пробел."""
+    return ' '.join(stem(word) for word, _ in WORD.findall(text))
+
+
+def build_query(query):
+    """Запрос FTS5: все слова обязательны, "слово*" - поиск по префиксу."""
+    return ' '.join(
+        f'"{stem(word)}"*' if prefix else f'"{stem(word)}"'
+        for word, prefix in WORD.findall(query)
+    )
+
+
+def _execute(sql, params=()):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def index_post(post):
+    if not is_available():
+        return
+    remove_post(post.pk)
+    _execute(f'INSERT INTO {POST_TABLE} (rowid, terms) VALUES (%s, %s)',
+             [post.pk, normalize(post.text)])
+
+
+def remove_post(post_id):
+    if is_available():
+        _execute(f'DELETE FROM {POST_TABLE} WHERE rowid = %s', [post_id])
+
+
+def index_comment(comment):
+    if not is_available():
+        return
+    remove_comment(comment.pk)
+    _execute(
+        f'INSERT INTO {COMMENT_TABLE} (rowid, terms, post_id) '
+        f'VALUES (%s, %s, %s)',
+        [comment.pk, normalize(comment.text), comment.post_id]
+    )
+
+
+def remove_comment(comment_id):
+    if is_available():
+        _execute(
+            f'DELETE FROM {COMMENT_TABLE} WHERE rowid = %s', [comment_id])
+
+
+def search_post_ids(query, limit=None):
+    """id постов, найденных по тексту поста или его комментариев,
+    в порядке релевантности (bm25)."""
+    match = build_query(query)
+    if not match:
+        return []
+    rows = _execute(
+        f'SELECT post_id FROM ('
+        f'  SELECT rowid AS post_id, bm25({POST_TABLE}) AS rank'
+        f'  FROM {POST_TABLE} WHERE {POST_TABLE} MATCH %s'
+        f'  UNION ALL'
+        f'  SELECT post_id, bm25({COMMENT_TABLE}) * %s'
+        f'  FROM {COMMENT_TABLE} WHERE {COMMENT_TABLE} MATCH %s'
+        f') GROUP BY post_id ORDER BY MIN(rank) LIMIT %s',
+        [match, COMMENT_WEIGHT, match, limit or settings.SEARCH_RESULTS_LIMIT]
+    )
+    return [post_id for post_id, in rows]
+
+
+def search_comment_ids(query, limit=None):
+    """id комментариев в порядке релевантности."""
+    match = build_query(query)
+    if not match:
+        return []
+    rows = _execute(
+        f'SELECT rowid FROM {COMMENT_TABLE} WHERE {COMMENT_TABLE} MATCH %s '
+        f'ORDER BY rank LIMIT %s',
+        [match, limit or settings.SEARCH_RESULTS_LIMIT]
+    )
+    return [comment_id for comment_id, in rows]
+
+
+def rebuild(chunk_size=1000):
+    """Заново строит индекс по всем постам и комментариям."""
+    from .models import Comment, Post
+
+    _execute(f'DELETE FROM {POST_TABLE}')
+    _execute(f'DELETE FROM {COMMENT_TABLE}')
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {POST_TABLE} (rowid, terms) VALUES (%s, %s)',
+            ((pk, normalize(text)) for pk, text in Post.objects.values_list(
+                'pk', 'text').iterator(chunk_size=chunk_size))
+        )
+        cursor.executemany(
+            f'INSERT INTO {COMMENT_TABLE} (rowid, terms, post_id) '
+            f'VALUES (%s, %s, %s)',
+            ((pk, normalize(text), post_id) for pk, text, post_id in
+             Comment.objects.values_list('pk', 'text', 'post').iterator(
+                 chunk_size=chunk_size))
+        )
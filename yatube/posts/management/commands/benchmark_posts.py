@@ -0,0 +1,79 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+
+METRICS = (
+    'throughput', 'p50_ms', 'p95_ms', 'p99_ms',
+    'queries_per_request', 'bytes_per_response',
+)
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон страниц posts на заполненной базе. '
+            'Сценарии post_create и add_comment пишут в базу')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--views', nargs='+', choices=list(benchmark.SCENARIOS),
+            default=list(benchmark.SCENARIOS),
+        )
+        parser.add_argument('--clients', type=int, default=4)
+        parser.add_argument(
+            '--anonymous', type=int,
+            help='Сколько клиентов не входят на сайт, по умолчанию половина',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Число замеряемых запросов к каждой странице',
+        )
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', help='Сохранить результаты в JSON-файл')
+        parser.add_argument(
+            '--compare', help='Сравнить с результатами из JSON-файла')
+
+    def handle(self, *args, **options):
+        try:
+            results = benchmark.run(
+                options['views'],
+                clients=options['clients'],
+                requests=options['requests'],
+                warmup=options['warmup'],
+                seed=options['seed'],
+                anonymous=options['anonymous'],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        previous = {}
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                previous = json.load(file)['results']
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name}: {result["requests"]} запросов, '
+                f'ошибок {result["errors"]}')
+            for metric in METRICS:
+                line = f'  {metric}: {result[metric]}'
+                old = previous.get(name, {}).get(metric)
+                if old:
+                    change = (result[metric] - old) / old * 100
+                    line += f' (было {old}, {change:+.1f}%)'
+                self.stdout.write(line)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(
+                    {
+                        'options': {
+                            key: options[key] for key in (
+                                'views', 'clients', 'anonymous',
+                                'requests', 'warmup', 'seed')
+                        },
+                        'results': results,
+                    },
+                    file, ensure_ascii=False, indent=2
+                )
+            self.stdout.write(
+                self.style.SUCCESS(f'Результаты: {options["output"]}'))
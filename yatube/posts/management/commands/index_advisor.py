@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import query_plans
+from core.query_budget import BUDGET_FILE, load_budgets
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Находит в планах запросов страниц полные проходы таблиц '
+            'и временные сортировки и предлагает индексы')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--views', nargs='+', choices=list(benchmark.SCENARIOS),
+            default=benchmark.READ_SCENARIOS,
+            help='Сценарии нагрузочного прогона, запросы которых '
+                 'разбираются. По умолчанию - только читающие: '
+                 'post_create и add_comment пишут в базу, их нужно '
+                 'указать явно',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=20,
+            help='Сколько запросов к каждой странице сделать',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--budgets', nargs='?', const=BUDGET_FILE,
+            help='Взять запросы из файла бюджета, записанного тестами, '
+                 'вместо нагрузочного прогона',
+        )
+
+    def statements(self, options):
+        if options['budgets']:
+            return {
+                name: budget['sql'] for name, budget in sorted(
+                    load_budgets(options['budgets']).items())
+            }
+        try:
+            return benchmark.capture(
+                options['views'], requests=options['requests'],
+                seed=options['seed'])
+        except ValueError as error:
+            raise CommandError(error)
+
+    def handle(self, *args, **options):
+        suggestions = set()
+        for name, statements in self.statements(options).items():
+            for sql, plan, found, suggested in query_plans.analyze(
+                    connection, statements):
+                self.stdout.write(f'{name}: {sql}')
+                for problem in found:
+                    self.stdout.write(
+                        f"  {problem.kind} {problem.table or ''}: "
+                        f"{problem.detail}")
+                for suggestion in suggested:
+                    self.stdout.write(f'  индекс: {suggestion}')
+                suggestions.update(suggested)
+        if not suggestions:
+            self.stdout.write(self.style.SUCCESS('Новые индексы не нужны'))
+            return
+        self.stdout.write('Предлагаемые индексы:')
+        for suggestion in sorted(suggestions):
+            self.stdout.write(f'  {suggestion}')
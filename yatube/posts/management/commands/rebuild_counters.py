@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Проверяет и пересчитывает счетчики постов, комментариев и подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить счетчики, ничего не исправляя',
+        )
+
+    def handle(self, *args, **options):
+        missing = counters.missing_stats().count()
+        mismatches = counters.find_mismatches()
+        if missing:
+            self.stdout.write(f'Пользователей без счетчиков: {missing}')
+        for model, pk, field, stored, actual in mismatches:
+            self.stdout.write(
+                f'{model._meta.label} pk={pk} {field}: '
+                f'{stored} != {actual}'
+            )
+        if options['check']:
+            if missing or mismatches:
+                raise CommandError('Счетчики расходятся с данными')
+            self.stdout.write(self.style.SUCCESS('Счетчики в порядке'))
+            return
+        with transaction.atomic():
+            counters.rebuild()
+        self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import fulltext
+
+
+class Command(BaseCommand):
+    help = 'Заново строит полнотекстовый индекс постов и комментариев'
+
+    def handle(self, *args, **options):
+        if not fulltext.is_available():
+            raise CommandError(
+                'Полнотекстовый индекс доступен только в SQLite')
+        with transaction.atomic():
+            fulltext.rebuild()
+        self.stdout.write(self.style.SUCCESS('Индекс перестроен'))
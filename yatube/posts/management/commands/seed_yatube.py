@@ -0,0 +1,91 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts.seeding import Seeder
+
+
+def date(value):
+    try:
+        return timezone.make_aware(datetime.strptime(value, '%Y-%m-%d'))
+    except ValueError:
+        raise CommandError(f'Дата должна быть в формате ГГГГ-ММ-ДД: {value}')
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, группами, '
+            'постами, комментариями и подписками')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=10000)
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Одинаковый seed дает одинаковые данные',
+        )
+        parser.add_argument(
+            '--until',
+            help='Дата самых новых записей, ГГГГ-ММ-ДД (по умолчанию '
+                 'сегодня)',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней до --until распределить записи',
+        )
+        parser.add_argument('--chunk-size', type=int, default=20000)
+        parser.add_argument(
+            '--author-skew', type=float, default=2.0,
+            help='Неравномерность числа постов у авторов',
+        )
+        parser.add_argument(
+            '--follow-skew', type=float, default=3.0,
+            help='Неравномерность числа подписчиков',
+        )
+        parser.add_argument(
+            '--comment-skew', type=float, default=3.0,
+            help='Неравномерность числа комментариев к постам',
+        )
+        parser.add_argument(
+            '--group-share', type=float, default=0.5,
+            help='Доля постов в группах',
+        )
+        parser.add_argument(
+            '--image-share', type=float, default=0.0,
+            help='Доля постов с картинкой-заглушкой',
+        )
+        parser.add_argument(
+            '--no-search-index', action='store_true',
+            help='Не перестраивать полнотекстовый индекс',
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 and (
+                options['posts'] or options['comments'] or options['follows']):
+            raise CommandError('Для постов и подписок нужны пользователи')
+        seeder = Seeder(
+            seed=options['seed'],
+            chunk_size=options['chunk_size'],
+            until=date(options['until']) if options['until'] else None,
+            days=options['days'],
+            log=self.stdout.write,
+        )
+        user_ids = seeder.users(options['users'])
+        group_ids = seeder.groups(options['groups'])
+        post_range = seeder.posts(
+            options['posts'], user_ids, group_ids,
+            author_skew=options['author_skew'],
+            group_share=options['group_share'],
+            image_share=options['image_share'],
+        )
+        seeder.comments(
+            options['comments'], user_ids, post_range,
+            post_skew=options['comment_skew'])
+        seeder.follows(
+            options['follows'], user_ids,
+            author_skew=options['follow_skew'])
+        seeder.finish(search_index=not options['no_search_index'])
+        self.stdout.write(self.style.SUCCESS('База заполнена'))
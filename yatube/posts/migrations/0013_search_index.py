@@ -0,0 +1,59 @@
+import re
+
+from django.db import migrations
+
+# Стеммер не копируется: основы слов в индексе должны совпадать
+# с основами в запросах (posts.fulltext.build_query). После изменения
+# стеммера индекс перестраивает команда rebuild_search_index.
+from posts.stemmer import stem
+
+WORD = re.compile(r'\w+')
+
+
+def normalize(text):
+    return ' '.join(stem(word) for word in WORD.findall(text))
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts '
+            'USING fts5(terms)')
+        cursor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS posts_comment_fts '
+            'USING fts5(terms, post_id UNINDEXED)')
+        cursor.executemany(
+            'INSERT INTO posts_post_fts (rowid, terms) VALUES (%s, %s)',
+            [(pk, normalize(text))
+             for pk, text in Post.objects.values_list('pk', 'text')]
+        )
+        cursor.executemany(
+            'INSERT INTO posts_comment_fts (rowid, terms, post_id) '
+            'VALUES (%s, %s, %s)',
+            [(pk, normalize(text), post_id)
+             for pk, text, post_id in Comment.objects.values_list(
+                 'pk', 'text', 'post')]
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP TABLE IF EXISTS posts_post_fts')
+        cursor.execute('DROP TABLE IF EXISTS posts_comment_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -15,6 +15,8 @@ class Group(models.Model):
         unique=True,
         db_index=True)
     description = models.TextField("Описание группы")
+    posts_count = models.PositiveIntegerField(
+        "Количество постов", default=0, editable=False)
 
     def __str__(self):
         return self.title
@@ -24,6 +26,29 @@ class Group(models.Model):
         verbose_name_plural = "Группы"
 
 
+class PostQuerySet(models.QuerySet):
+    """Выборки постов под нужды страниц."""
+
+    def for_feed(self):
+        """Списки постов: автор и группа одним запросом,
+        только поля, которые выводит posts/includes/post_list.html."""
+        return self.select_related('author', 'group').only(
+            'text', 'created', 'image', 'author__username',
+            'author__first_name', 'author__last_name', 'group__slug')
+
+    def for_detail(self):
+        """Страница поста со счетчиками автора."""
+        return self.select_related('author__stats', 'group')
+
+    def for_edit(self, *fields):
+        """Проверка прав и изменение поста: без текста и связанных
+        объектов, fields - дополнительные поля, например поля формы.
+        Сохранение такого поста не перезаписывает незагруженные поля,
+        например счетчик комментариев, а дата изменения загружается,
+        чтобы обновиться при сохранении."""
+        return self.only('author', 'group', 'modified', *fields)
+
+
 class Post(CreatedModel):
     text = models.TextField(
         "Текст поста",
@@ -49,11 +74,28 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        "Количество комментариев", default=0, editable=False)
+    # Меняется при редактировании поста и при новых комментариях.
+    modified = models.DateTimeField("Дата изменения", auto_now=True)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-created',)
         verbose_name = "Пост"
         verbose_name_plural = "Посты"
+        # Ленты автора и группы: отбор и порядок по одному индексу.
+        # Индекс по возрастанию, пройденный с конца, дает и -created,
+        # и -pk для равных дат (pk - rowid в конце индекса).
+        indexes = [
+            models.Index(
+                fields=["author", "created"], name="post_author_created_idx"
+            ),
+            models.Index(
+                fields=["group", "created"], name="post_group_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.text[:settings.LENGH_OF_TEXT]
@@ -84,6 +126,11 @@ class Comment(CreatedModel):
         ordering = ('-created',)
         verbose_name = "Комментарий"
         verbose_name_plural = "Комментарии"
+        indexes = [
+            models.Index(
+                fields=["post", "created"], name="comment_post_created_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.text[:settings.LENGH_OF_TEXT]
@@ -115,3 +162,26 @@ class Follow(models.Model):
                 check=~models.Q(user=models.F("author")),
             ),
         ]
+
+
+class UserStats(models.Model):
+    """Счетчики пользователя, обновляемые при записи."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+        verbose_name="Пользователь"
+    )
+    posts_count = models.PositiveIntegerField("Количество постов", default=0)
+    followers_count = models.PositiveIntegerField(
+        "Количество подписчиков", default=0)
+    following_count = models.PositiveIntegerField(
+        "Количество подписок", default=0)
+
+    class Meta:
+        verbose_name = "Счетчики пользователя"
+        verbose_name_plural = "Счетчики пользователей"
+
+    def __str__(self):
+        return str(self.user)
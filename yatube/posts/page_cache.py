@@ -0,0 +1,187 @@
+"""Кэш целых страниц для анонимных посетителей.
+
+Страница, отданная анонимному посетителю, сохраняется в кэше вместе
+с версиями лент, от которых она зависит (см. depends_on). Повторный
+запрос анонимного посетителя сверяет версии и, если ни одна лента
+не менялась, отдает сохраненную страницу, не выполняя представление
+и не обращаясь к БД. Запись постов, комментариев и подписок меняет
+версии лент, и страница рисуется заново.
+
+Части страницы, зависящие от посетителя и адреса (шапка, переключатель
+лент, кнопка подписки), подключаются тегом {% hole %}. В кэш они
+попадают пустыми и дорисовываются при каждой выдаче: по имени шаблона
+и сохраненным параметрам, с контекстом текущего запроса.
+
+Те же версии лент (и дата изменения, если она передана в depends_on)
+служат валидаторами условных запросов: conditional_page выставляет
+ETag, а если у клиента актуальная страница, отвечает 304 сразу
+из depends_on, до выборки постов и отрисовки шаблонов. Last-Modified
+не выставляется: дата изменения поста не учитывает остальные ленты
+страницы, и If-Modified-Since получал бы 304 с устаревшей страницей.
+"""
+import base64
+import hashlib
+import json
+import re
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag, urlencode
+
+from core import fragments
+
+from . import feeds, thumbnails
+from .utils import CURSOR_NEWER, CURSOR_OLDER
+
+PAGE_KEY = 'page:{digest}'
+# Параметры адреса, от которых зависят кэшируемые страницы. Остальные
+# в ключ не входят: иначе каждый лишний параметр создавал бы новую
+# запись и вытеснял из кэша настоящие страницы.
+PAGE_PARAMS = ('page', CURSOR_OLDER, CURSOR_NEWER, 'format')
+HOLE = '<!--hole {spec}-->{content}<!--endhole-->'
+HOLE_RE = re.compile(r'<!--hole ([\w=-]*)-->(.*?)<!--endhole-->', re.S)
+
+
+def _encode(template_name, params):
+    raw = json.dumps([template_name, params]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode(spec):
+    return json.loads(base64.urlsafe_b64decode(spec))
+
+
+def hole(template_name, params, content):
+    """Оборачивает отрисованную часть страницы метками."""
+    return HOLE.format(spec=_encode(template_name, params), content=content)
+
+
+def punch(content):
+    """Страница без зависящих от посетителя частей, для кэша."""
+    return HOLE_RE.sub(
+        lambda match: HOLE.format(spec=match[1], content=''), content)
+
+
+def fill(request, content):
+    """Дорисовывает части страницы для текущего запроса."""
+    def render(match):
+        template_name, params = _decode(match[1])
+        return HOLE.format(
+            spec=match[1],
+            content=render_to_string(template_name, params, request))
+    return HOLE_RE.sub(render, content)
+
+
+class NotModified(Exception):
+    """У клиента актуальная версия страницы, см. conditional_page."""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+def _validate(request, versions, modified):
+    request.page_feed_versions = versions
+    request.page_modified = modified
+    # Страница зависит и от посетителя: шапка, кнопка подписки.
+    # В страницах авторизованного посетителя есть csrf_token, а токен
+    # меняется при входе: без него после повторного входа браузер
+    # получил бы 304 и отправил форму со старым токеном.
+    visitor = None
+    if request.user.is_authenticated:
+        # get_token заводит токен, если cookie еще нет, - тот же,
+        # что попадет в форму страницы.
+        get_token(request)
+        visitor = [request.user.pk, request.META['CSRF_COOKIE']]
+    raw = json.dumps(
+        [visitor, modified and modified.isoformat(),
+         sorted(versions.items())]).encode()
+    request.page_etag = quote_etag(hashlib.md5(raw).hexdigest())
+    if request.method not in ('GET', 'HEAD'):
+        return
+    response = get_conditional_response(request, etag=request.page_etag)
+    if response is not None:
+        raise NotModified(response)
+
+
+def depends_on(request, *feed_names, modified=None):
+    """Отмечает ленты, от которых зависит страница, и дату ее
+    изменения. Версии читаются сразу, до выборки постов: изменение
+    во время отрисовки оставит в кэше прежнюю версию, и страница будет
+    нарисована снова. Если у клиента актуальная страница, прерывает
+    представление исключением NotModified."""
+    _validate(request, feeds.get_versions(feed_names), modified)
+
+
+def _key(request):
+    params = urlencode([
+        (name, value) for name in PAGE_PARAMS
+        for value in request.GET.getlist(name)
+    ])
+    digest = hashlib.md5(f'{request.path}?{params}'.encode()).hexdigest()
+    return PAGE_KEY.format(digest=digest)
+
+
+def cache_anonymous_page(view):
+    """Кэширует страницы представления для анонимных посетителей.
+    Кэшируются только ответы 200 представлений, вызвавших depends_on,
+    без заглушек вместо еще не готовых миниатюр и без устаревших
+    фрагментов, выданных, пока их перерисовывает другой запрос."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or (
+                request.user.is_authenticated):
+            return view(request, *args, **kwargs)
+        key = _key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            versions, modified, content, content_type = entry
+            if feeds.get_versions(versions) == versions:
+                _validate(request, versions, modified)
+                return HttpResponse(
+                    fill(request, content), content_type=content_type)
+        response = view(request, *args, **kwargs)
+        versions = getattr(request, 'page_feed_versions', None)
+        if (versions is not None and response.status_code == 200
+                and not response.streaming
+                and not thumbnails.placeholders_shown()
+                and not fragments.stale_served()):
+            content = response.content.decode(response.charset)
+            cache.set(
+                key,
+                (versions, request.page_modified, punch(content),
+                 response['Content-Type']),
+                settings.PAGE_CACHE_TIMEOUT)
+        return response
+    return wrapper
+
+
+def _set_validators(request, response):
+    response['ETag'] = request.page_etag
+    patch_vary_headers(response, ('Cookie',))
+
+
+def conditional_page(view):
+    """Отвечает на условные запросы к страницам, вызывающим
+    depends_on: выставляет ETag или отвечает 304. Страница
+    с устаревшими фрагментами отдается без ETag: он описывает текущие
+    версии лент, и клиент получал бы 304 на устаревшую страницу."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            response = view(request, *args, **kwargs)
+        except NotModified as not_modified:
+            response = not_modified.response
+        else:
+            if (response.status_code != 200
+                    or not hasattr(request, 'page_etag')
+                    or fragments.stale_served()):
+                return response
+        _set_validators(request, response)
+        return response
+    return wrapper
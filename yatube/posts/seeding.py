@@ -0,0 +1,214 @@
+"""Синтетические данные для проверок на объемах, близких к боевым.
+
+Пользователи и группы создаются bulk_create, а посты, комментарии
+и подписки, которых на порядки больше, - одним INSERT на пачку через
+executemany, минуя создание объектов моделей. Каждая пачка из
+chunk_size записей сохраняется в своей транзакции. Сигналы моделей при
+этом не срабатывают, поэтому после генерации счетчики и поисковый
+индекс пересчитываются целиком.
+
+Активность авторов, популярность постов и число подписчиков
+распределены по степенному закону: номер записи выбирается как
+int(n * random() ** skew), и при skew > 1 первые записи встречаются
+намного чаще остальных. Одинаковые seed и until дают одинаковые данные.
+"""
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import counters, fulltext
+from .models import Comment, Follow, Group, Post, User
+
+WORDS = (
+    'день', 'город', 'поезд', 'вагон', 'дорога', 'море', 'лес', 'река',
+    'книга', 'письмо', 'друг', 'работа', 'вечер', 'утро', 'дом', 'окно',
+    'кошка', 'собака', 'музыка', 'фильм', 'погода', 'дождь', 'снег',
+    'солнце', 'лето', 'зима', 'осень', 'весна', 'python', 'django',
+    'программа', 'ошибка', 'запрос', 'страница', 'новый', 'старый',
+    'большой', 'маленький', 'красивый', 'интересный', 'долгий', 'быстрый',
+    'читал', 'писал', 'смотрел', 'гулял', 'думал', 'ждал', 'нашел',
+    'сегодня', 'вчера', 'завтра', 'снова', 'очень', 'почти', 'всегда',
+)
+SYLLABLES = (
+    'ба', 'ве', 'го', 'ду', 'ка', 'ли', 'мо', 'ны', 'пе', 'ра', 'со', 'ту',
+    'фа', 'хи', 'че', 'ша', 'ст', 'ро', 'ни', 'ла', 'ми', 'за', 'до', 'ре',
+)
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Петр', 'Ольга', 'Сергей', 'Елена')
+LAST_NAMES = ('Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов')
+
+IMAGE_STUB = 'posts/seed_stub.gif'
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def last_pk(model):
+    return model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+
+class Seeder:
+    def __init__(self, seed=0, chunk_size=20000, until=None, days=365,
+                 vocabulary_size=5000, log=None):
+        self.rng = random.Random(seed)
+        self.chunk_size = chunk_size
+        self.until = until or timezone.now().replace(
+            hour=0, minute=0, second=0, microsecond=0)
+        self.period = days * 24 * 60 * 60
+        self.log = log or (lambda message: None)
+        # Частоты слов убывают как 1 / ранг (закон Ципфа).
+        self.vocabulary = list(WORDS) + [
+            ''.join(self.rng.choices(SYLLABLES, k=self.rng.randint(2, 4)))
+            for _ in range(vocabulary_size)
+        ]
+        self.word_weights = list(accumulate(
+            1 / rank for rank in range(1, len(self.vocabulary) + 1)))
+
+    def skewed(self, n, skew):
+        return int(n * self.rng.random() ** skew)
+
+    def text(self, min_words, max_words):
+        words = self.rng.choices(
+            self.vocabulary, cum_weights=self.word_weights,
+            k=self.rng.randint(min_words, max_words))
+        return ' '.join(words).capitalize()
+
+    def created(self, i, total):
+        """Дата i-й из total записей. Даты растут вместе с id,
+        как у записей, созданных через сайт."""
+        ago = self.period * (total - i - self.rng.random()) / total
+        return connection.ops.adapt_datetimefield_value(
+            self.until - timedelta(seconds=ago))
+
+    def insert(self, model, total, make, fields=None,
+               ignore_conflicts=False):
+        """Создает total записей model, make(i) возвращает одну запись:
+        объект модели или, если заданы fields, кортеж значений этих
+        полей, готовых к записи в БД. Записи None пропускаются.
+        Возвращает id первой и последней созданной записи."""
+        first = last_pk(model) + 1
+        started = time.monotonic()
+        for start in range(0, total, self.chunk_size):
+            chunk = range(start, min(start + self.chunk_size, total))
+            rows = [row for row in map(make, chunk) if row is not None]
+            with transaction.atomic():
+                if fields is None:
+                    model.objects.bulk_create(
+                        rows, ignore_conflicts=ignore_conflicts)
+                else:
+                    self.insert_rows(model, fields, rows, ignore_conflicts)
+        self.log(
+            f'{model._meta.verbose_name_plural.capitalize()}: {total} '
+            f'за {time.monotonic() - started:.1f} с'
+        )
+        return first, last_pk(model)
+
+    def insert_rows(self, model, fields, rows, ignore_conflicts=False):
+        ops = connection.ops
+        columns = ', '.join(
+            ops.quote_name(model._meta.get_field(name).column)
+            for name in fields
+        )
+        placeholders = ', '.join(['%s'] * len(fields))
+        sql = (
+            f'{ops.insert_statement(ignore_conflicts=ignore_conflicts)} '
+            f'{ops.quote_name(model._meta.db_table)} ({columns}) '
+            f'VALUES ({placeholders}) '
+            f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts)}'
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+
+    def users(self, total):
+        offset = last_pk(User)
+        first, last = self.insert(User, total, lambda i: User(
+            username=f'seed{offset + i + 1}',
+            first_name=self.rng.choice(FIRST_NAMES),
+            last_name=self.rng.choice(LAST_NAMES),
+            password=UNUSABLE_PASSWORD_PREFIX,
+        ))
+        return list(User.objects.filter(
+            pk__range=(first, last)).values_list('pk', flat=True))
+
+    def groups(self, total):
+        offset = last_pk(Group)
+        first, last = self.insert(Group, total, lambda i: Group(
+            title=f'Группа {offset + i + 1}',
+            slug=f'seed-{offset + i + 1}',
+            description=self.text(5, 20),
+        ))
+        return list(Group.objects.filter(
+            pk__range=(first, last)).values_list('pk', flat=True))
+
+    def posts(self, total, author_ids, group_ids, author_skew=2.0,
+              group_share=0.5, image_share=0.0):
+        if image_share and not default_storage.exists(IMAGE_STUB):
+            default_storage.save(IMAGE_STUB, ContentFile(SMALL_GIF))
+
+        def make(i):
+            in_group = group_ids and self.rng.random() < group_share
+            created = self.created(i, total)
+            return (
+                self.text(5, 60),
+                author_ids[self.skewed(len(author_ids), author_skew)],
+                self.rng.choice(group_ids) if in_group else None,
+                IMAGE_STUB if self.rng.random() < image_share else '',
+                created,
+                created,
+                0,
+            )
+
+        return self.insert(Post, total, make, fields=(
+            'text', 'author', 'group', 'image', 'created', 'modified',
+            'comments_count'))
+
+    def comments(self, total, author_ids, post_range, post_skew=3.0):
+        first, last = post_range
+        if first > last:
+            return
+        self.insert(Comment, total, lambda i: (
+            self.text(2, 20),
+            self.rng.choice(author_ids),
+            # Свежие посты комментируют чаще.
+            last - self.skewed(last - first + 1, post_skew),
+            self.created(i, total),
+        ), fields=('text', 'author', 'post', 'created'))
+
+    def follows(self, total, user_ids, author_skew=3.0):
+        def make(i):
+            user_id = self.rng.choice(user_ids)
+            author_id = user_ids[self.skewed(len(user_ids), author_skew)]
+            if user_id == author_id:
+                return None
+            return user_id, author_id
+
+        # Повторные подписки пропускаются, поэтому их может
+        # получиться меньше total.
+        self.insert(Follow, total, make, fields=('user', 'author'),
+                    ignore_conflicts=True)
+
+    def finish(self, search_index=True):
+        """Пересчитывает то, что при записи обновляют сигналы."""
+        started = time.monotonic()
+        with transaction.atomic():
+            counters.rebuild()
+        if search_index and fulltext.is_available():
+            with transaction.atomic():
+                fulltext.rebuild()
+        # Ленты и версии кэша страниц строятся заново.
+        cache.clear()
+        self.log(
+            f'Счетчики и индекс: {time.monotonic() - started:.1f} с')
@@ -0,0 +1,102 @@
+from django.core.signals import request_finished, request_started
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_delete
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import counters, feeds, fulltext, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(request_started)
+def request_started_handler(sender, **kwargs):
+    thumbnails.start_request()
+
+
+@receiver(request_finished)
+def request_finished_handler(sender, **kwargs):
+    thumbnails.finish_request()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_init, sender=Post)
+def post_loaded(sender, instance, **kwargs):
+    # Группа на момент загрузки: нужна, чтобы перенести счетчик
+    # при смене группы. Не обращаемся к отложенному полю.
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    feeds.bump(*feeds.post_feeds(instance, [instance._loaded_group_id]))
+    fulltext.index_post(instance)
+    if created:
+        counters.change(UserStats, instance.author_id, 'posts_count', 1)
+        counters.change(Group, instance.group_id, 'posts_count', 1)
+        timeline.fan_out(instance)
+    elif instance._loaded_group_id != instance.group_id:
+        counters.change(Group, instance._loaded_group_id, 'posts_count', -1)
+        counters.change(Group, instance.group_id, 'posts_count', 1)
+    instance._loaded_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    feeds.bump(*feeds.post_feeds(instance))
+    fulltext.remove_post(instance.pk)
+    counters.change(UserStats, instance.author_id, 'posts_count', -1)
+    counters.change(Group, instance.group_id, 'posts_count', -1)
+    timeline.purge_post(instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    # Посты группы выводятся и на главной, и в профилях их авторов.
+    authors = Post.objects.filter(group=instance).values_list(
+        'author', flat=True).distinct()
+    feeds.bump(
+        feeds.INDEX,
+        feeds.group_feed(instance.pk),
+        *(feeds.profile_feed(author_id) for author_id in authors)
+    )
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    feeds.bump(feeds.post_feed(instance.post_id))
+    fulltext.index_comment(instance)
+    if created:
+        counters.change(Post, instance.post_id, 'comments_count', 1,
+                        modified=timezone.now())
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    feeds.bump(feeds.post_feed(instance.post_id))
+    fulltext.remove_comment(instance.pk)
+    counters.change(Post, instance.post_id, 'comments_count', -1,
+                    modified=timezone.now())
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        feeds.bump(feeds.followers_feed(instance.author_id))
+        counters.change(UserStats, instance.author_id, 'followers_count', 1)
+        counters.change(UserStats, instance.user_id, 'following_count', 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    feeds.bump(feeds.followers_feed(instance.author_id))
+    counters.change(UserStats, instance.author_id, 'followers_count', -1)
+    counters.change(UserStats, instance.user_id, 'following_count', -1)
+    timeline.purge_author(instance.user_id, instance.author_id)
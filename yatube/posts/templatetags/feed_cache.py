@@ -0,0 +1,11 @@
+from django import template
+
+from posts import feeds
+
+register = template.Library()
+
+
+@register.simple_tag
+def feed_version(*parts):
+    """Версия ленты для ключа кэша: {% feed_version 'group' group.pk %}."""
+    return feeds.get_version(feeds.feed_name(*parts))
@@ -0,0 +1,22 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts import page_cache
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, template_name, **params):
+    """Подключает шаблон, как include, но в кэше страницы для анонимных
+    посетителей он дорисовывается при каждой выдаче, см. posts.page_cache:
+
+        {% hole 'posts/includes/switcher.html' %}
+
+    При дорисовке шаблону доступны только контекст запроса и params,
+    поэтому params не должны зависеть от посетителя.
+    """
+    included = context.template.engine.get_template(template_name)
+    with context.push(**params):
+        content = included.render(context)
+    return mark_safe(page_cache.hole(template_name, params, content))
@@ -0,0 +1,33 @@
+from django import template
+
+from posts.utils import CURSOR_NEWER, CURSOR_OLDER, next_page_url
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def page_url(context, **params):
+    """Ссылка на страницу с сохранением остальных параметров запроса:
+    {% page_url page=2 %} на странице /search/?q=text
+    вернет ?q=text&page=2."""
+    query = context['request'].GET.copy()
+    for key in ('page', CURSOR_OLDER, CURSOR_NEWER):
+        query.pop(key, None)
+    for key, value in params.items():
+        query[key] = str(value)
+    return f'?{query.urlencode()}'
+
+
+@register.simple_tag
+def page_window(page_obj):
+    """Номера страниц для навигации: {% page_window page_obj as pages %}.
+    Вместо пропущенных номеров - paginator.ELLIPSIS."""
+    return list(
+        page_obj.paginator.get_elided_page_range(page_obj.number))
+
+
+@register.inclusion_tag('posts/includes/feed_next.html')
+def feed_next(page_obj, url_name, *args):
+    """Метка, по которой скрипт в base.html подгружает следующие посты
+    из фрагмента url_name: {% feed_next page_obj 'posts:index_feed' %}."""
+    return {'next_url': next_page_url(page_obj, url_name, *args)}
@@ -0,0 +1,20 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_thumbnail(image, geometry, **options):
+    """Готовая миниатюра или None, пока она создается в фоне:
+    {% ready_thumbnail post.image "960x339" crop="center" as im %}."""
+    return thumbnails.get_ready(image, geometry, **options)
+
+
+@register.simple_tag
+def prefetch_thumbnails(posts):
+    """Загружает записи о миниатюрах всех постов страницы одним
+    запросом: {% prefetch_thumbnails page_obj %} перед циклом."""
+    thumbnails.prefetch(posts)
+    return ''
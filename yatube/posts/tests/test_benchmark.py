@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+
+from posts import benchmark
+from posts.benchmark import percentile, quiet_request_errors
+from posts.models import Comment, Post
+from posts.seeding import Seeder
+
+
+class PercentileTests(SimpleTestCase):
+    def test_percentile(self):
+        """Проверяем перцентили по ближайшему рангу."""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([3, 1, 2], 95), 3)
+        self.assertIsNone(percentile([], 50))
+
+
+class QuietRequestErrorsTests(SimpleTestCase):
+    def test_only_run_threads_silenced(self):
+        """Проверяем, что ошибки ответов скрываются только в потоках
+         прогона, а не во всем процессе."""
+        logger = logging.getLogger('django.request')
+        with self.assertLogs(logger, logging.ERROR) as logs:
+            with quiet_request_errors():
+                logger.error('Ошибка прогона')
+                thread = threading.Thread(
+                    target=logger.error, args=['Ошибка другого потока'])
+                thread.start()
+                thread.join()
+            logger.error('Ошибка после прогона')
+        self.assertEqual(
+            [record.getMessage() for record in logs.records],
+            ['Ошибка другого потока', 'Ошибка после прогона'])
+
+
+class BenchmarkTests(TransactionTestCase):
+    def setUp(self):
+        seeder = Seeder()
+        user_ids = seeder.users(10)
+        group_ids = seeder.groups(2)
+        seeder.posts(30, user_ids, group_ids)
+        seeder.follows(20, user_ids)
+        seeder.finish(search_index=False)
+
+    def test_benchmark_saves_results(self):
+        """Проверяем, что команда сохраняет сводку по страницам."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        output = os.path.join(directory.name, 'results.json')
+        call_command(
+            'benchmark_posts', views=['index', 'post_detail'],
+            clients=1, requests=5, warmup=1, output=output,
+            stdout=StringIO()
+        )
+        with open(output, encoding='utf-8') as file:
+            results = json.load(file)['results']
+        self.assertEqual(set(results), {'index', 'post_detail'})
+        for name, result in results.items():
+            with self.subTest(name=name):
+                self.assertEqual(result['requests'], 5)
+                self.assertEqual(result['errors'], 0)
+                self.assertGreater(result['queries_per_request'], 0)
+                self.assertGreater(result['bytes_per_response'], 0)
+
+    def test_anonymous_clients_use_page_cache(self):
+        """Проверяем, что анонимные клиенты получают страницы из кэша,
+         а сценарии с входом требуют вошедшего клиента."""
+        cache.clear()
+        results = benchmark.run(
+            ['index'], clients=2, anonymous=2, requests=5, warmup=1)
+        self.assertEqual(results['index']['errors'], 0)
+        self.assertEqual(results['index']['queries_per_request'], 0)
+        with self.assertRaises(CommandError):
+            call_command(
+                'benchmark_posts', views=['follow_index'], clients=2,
+                anonymous=2, stdout=StringIO())
+
+    def test_benchmark_requires_requests(self):
+        """Проверяем, что прогон без замеряемых запросов отклоняется."""
+        with self.assertRaises(CommandError):
+            call_command(
+                'benchmark_posts', views=['index'], requests=0,
+                stdout=StringIO())
+
+    def test_index_advisor(self):
+        """Проверяем, что советник находит сортировку без индекса
+         в ленте автора и предлагает недостающий индекс."""
+        cache.clear()
+        index = next(
+            index for index in Post._meta.indexes
+            if index.name == 'post_author_created_idx')
+        stdout = StringIO()
+        call_command(
+            'index_advisor', views=['profile'], requests=3, stdout=stdout)
+        self.assertIn('Новые индексы не нужны', stdout.getvalue())
+        with connection.schema_editor() as editor:
+            editor.remove_index(Post, index)
+        self.addCleanup(self.restore_index, index)
+        cache.clear()
+        stdout = StringIO()
+        call_command(
+            'index_advisor', views=['profile'], requests=3, stdout=stdout)
+        self.assertIn('temp sort posts_post', stdout.getvalue())
+        self.assertIn(
+            "posts.Post: models.Index(fields=['author', 'created'])",
+            stdout.getvalue())
+
+    def test_index_advisor_reads_by_default(self):
+        """Проверяем, что советник без --views не пишет в базу."""
+        posts = Post.objects.count()
+        comments = Comment.objects.count()
+        call_command('index_advisor', requests=1, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), posts)
+        self.assertEqual(Comment.objects.count(), comments)
+
+    def restore_index(self, index):
+        with connection.schema_editor() as editor:
+            editor.add_index(Post, index)
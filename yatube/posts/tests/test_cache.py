@@ -2,17 +2,91 @@ from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 
-from posts.models import Post, User
+from posts import feeds
+from posts.models import Comment, Group, Post, User
 
 
 class PostCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestAuthor')
+        cls.user_2 = User.objects.create(username='TestAuthor2')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group',
+            description='Тестовое описание группы'
+        )
+        cls.reverse_index = reverse('posts:index')
+        cls.reverse_group_list = reverse(
+            'posts:group_list', kwargs={'slug': cls.group.slug})
+        cls.reverse_profile = reverse(
+            'posts:profile', kwargs={'username': cls.user.username})
+        cls.reverse_profile_2 = reverse(
+            'posts:profile', kwargs={'username': cls.user_2.username})
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Тестовый пост', author=self.user, group=self.group)
+
     def test_cache_index(self):
-        user = User.objects.create(username='TestAuthor')
-        Post.objects.create(text='Тестовый пост', author=user)
-        response_1 = self.client.get(reverse('posts:index'))
-        Post.objects.all().delete()
-        response_2 = self.client.get(reverse('posts:index'))
+        """Проверяем, что главная страница берется из кэша, пока
+         данные меняются в обход моделей, и до очистки кэша."""
+        response_1 = self.client.get(self.reverse_index)
+        Post.objects.filter(pk=self.post.pk).update(text='Новый текст')
+        response_2 = self.client.get(self.reverse_index)
         self.assertEqual(response_1.content, response_2.content)
         cache.clear()
-        response_3 = self.client.get(reverse('posts:index'))
+        response_3 = self.client.get(self.reverse_index)
         self.assertNotEqual(response_1.content, response_3.content)
+
+    def test_post_changes_invalidate_feeds(self):
+        """Проверяем, что создание, редактирование и удаление поста
+         сразу видно в затронутых лентах."""
+        pages = (
+            self.reverse_index, self.reverse_group_list, self.reverse_profile)
+        for page in pages:
+            self.client.get(page)
+        self.post.text = 'Отредактированный пост'
+        self.post.save()
+        for page in pages:
+            with self.subTest(page=page, action='edit'):
+                self.assertContains(
+                    self.client.get(page), 'Отредактированный пост')
+        new_post = Post.objects.create(
+            text='Новый пост', author=self.user, group=self.group)
+        for page in pages:
+            with self.subTest(page=page, action='create'):
+                self.assertContains(self.client.get(page), 'Новый пост')
+        new_post.delete()
+        for page in pages:
+            with self.subTest(page=page, action='delete'):
+                self.assertNotContains(self.client.get(page), 'Новый пост')
+
+    def test_post_change_keeps_other_feeds_cached(self):
+        """Проверяем, что пост не сбрасывает кэш чужого профиля."""
+        post_2 = Post.objects.create(text='Чужой пост', author=self.user_2)
+        response_1 = self.client.get(self.reverse_profile_2)
+        Post.objects.filter(pk=post_2.pk).update(text='Новый текст')
+        Post.objects.create(text='Новый пост', author=self.user)
+        response_2 = self.client.get(self.reverse_profile_2)
+        self.assertEqual(response_1.content, response_2.content)
+
+    def test_group_change_invalidates_feeds(self):
+        """Проверяем, что изменение группы сбрасывает кэш лент
+         с постами группы."""
+        self.client.get(self.reverse_profile)
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'new-slug'
+        group.save()
+        self.assertContains(self.client.get(self.reverse_profile), 'new-slug')
+        self.assertContains(self.client.get(self.reverse_index), 'new-slug')
+
+    def test_comment_bumps_post_version(self):
+        """Проверяем, что комментарий меняет версию своего поста."""
+        version = feeds.get_version(feeds.post_feed(self.post.pk))
+        Comment.objects.create(
+            text='Комментарий', author=self.user_2, post=self.post)
+        self.assertNotEqual(
+            feeds.get_version(feeds.post_feed(self.post.pk)), version)
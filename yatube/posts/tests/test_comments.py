@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post, User
+
+COMMENTS_ON_PAGE = 3
+
+
+@override_settings(COMMENTS_ON_PAGE=COMMENTS_ON_PAGE)
+class CommentPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post_author = User.objects.create(username='TestAuthor')
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.post_author)
+        users = [
+            User.objects.create(username=f'Commenter{i}') for i in range(4)]
+        Comment.objects.bulk_create([
+            Comment(text=f'Комментарий {i}', author=users[i % len(users)],
+                    post=cls.post)
+            for i in range(COMMENTS_ON_PAGE * 2 + 1)
+        ])
+        cls.reverse_post_detail = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk})
+        cls.reverse_post_comments = reverse(
+            'posts:post_comments', kwargs={'post_id': cls.post.pk})
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_shows_first_page_of_comments(self):
+        """Проверяем, что на странице поста выводится только
+         первая страница комментариев."""
+        response = self.client.get(self.reverse_post_detail)
+        comments = list(response.context['comments'])
+        self.assertEqual(
+            comments,
+            list(Comment.objects.order_by('-created', '-pk')[
+                :COMMENTS_ON_PAGE])
+        )
+        self.assertContains(response, self.reverse_post_comments)
+
+    def test_fragment_pages_walk_all_comments(self):
+        """Проверяем, что фрагменты выводят все комментарии
+         по одному разу."""
+        page = self.client.get(self.reverse_post_detail).context['comments']
+        seen = list(page)
+        while page.has_next():
+            response = self.client.get(
+                self.reverse_post_comments, {'older': page.next_cursor})
+            self.assertTemplateUsed(response, 'posts/includes/comments.html')
+            self.assertTemplateNotUsed(response, 'base.html')
+            page = response.context['comments']
+            seen.extend(page)
+        self.assertEqual(
+            seen, list(Comment.objects.order_by('-created', '-pk')))
+
+    def test_comment_authors_loaded_with_comments(self):
+        """Проверяем, что число запросов фрагмента не зависит
+         от числа авторов комментариев: проверка поста и комментарии
+         с авторами."""
+        with self.assertNumQueries(2):
+            self.client.get(self.reverse_post_comments, {'older': ''})
+
+    def test_comments_of_missing_post_not_found(self):
+        """Проверяем, что фрагмент комментариев несуществующего поста
+         отвечает 404."""
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
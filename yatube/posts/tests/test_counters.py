@@ -0,0 +1,120 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create(username='TestAuthor')
+        cls.user_auth = User.objects.create(username='TestAuth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group',
+            description='Тестовое описание группы'
+        )
+        cls.group_2 = Group.objects.create(
+            title='Тестовая группа 2',
+            slug='test-group-2',
+            description='Тестовое описание группы 2'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.user_author)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user_auth)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_views(self):
+        """Проверяем, что создание и удаление через view
+         обновляют счетчики."""
+        self.author_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Новый пост', 'group': self.group.pk}
+        )
+        post = Post.objects.get(text='Новый пост')
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            data={'text': 'Комментарий'}
+        )
+        self.authorized_client.get(
+            reverse('posts:profile_follow',
+                    kwargs={'username': self.user_author.username}))
+        post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.stats(self.user_author).posts_count, 1)
+        self.assertEqual(self.stats(self.user_author).followers_count, 1)
+        self.assertEqual(self.stats(self.user_auth).following_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow',
+                    kwargs={'username': self.user_author.username}))
+        self.author_client.get(
+            reverse('posts:post_delete', kwargs={'post_id': post.pk}))
+        self.group.refresh_from_db()
+        self.assertEqual(self.stats(self.user_author).posts_count, 0)
+        self.assertEqual(self.stats(self.user_author).followers_count, 0)
+        self.assertEqual(self.stats(self.user_auth).following_count, 0)
+        self.assertEqual(self.group.posts_count, 0)
+
+    def test_group_change_moves_counter(self):
+        """Проверяем, что смена группы поста переносит счетчик."""
+        post = Post.objects.create(
+            text='Пост', author=self.user_author, group=self.group)
+        post = Post.objects.get(pk=post.pk)
+        post.group = self.group_2
+        post.save()
+        self.group.refresh_from_db()
+        self.group_2.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.group_2.posts_count, 1)
+
+    def test_feeds_do_not_count_posts(self):
+        """Проверяем, что профиль и группа не выполняют COUNT по постам
+         ни для счетчика, ни для пагинатора после записи."""
+        Post.objects.create(
+            text='Пост', author=self.user_author, group=self.group)
+        pages = (
+            reverse('posts:profile',
+                    kwargs={'username': self.user_author.username}),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+        )
+        for page in pages:
+            with self.subTest(page=page):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(page)
+                self.assertEqual(
+                    response.context['page_obj'].paginator.count, 1)
+                self.assertFalse([
+                    query['sql'] for query in queries
+                    if 'COUNT(' in query['sql']])
+
+    def test_rebuild_counters_command(self):
+        """Проверяем, что команда находит и исправляет расхождения."""
+        post = Post.objects.create(text='Пост', author=self.user_author)
+        Comment.objects.create(
+            text='Комментарий', author=self.user_auth, post=post)
+        Post.objects.filter(pk=post.pk).update(comments_count=5)
+        UserStats.objects.filter(user=self.user_auth).delete()
+        Follow.objects.create(user=self.user_auth, author=self.user_author)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', check=True, stdout=StringIO())
+        call_command('rebuild_counters', stdout=StringIO())
+        call_command('rebuild_counters', check=True, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.user_auth).following_count, 1)
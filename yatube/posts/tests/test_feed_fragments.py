@@ -0,0 +1,78 @@
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post, User
+
+POST_TEXT_RE = re.compile(r'<p>(Пост .*?)</p>')
+NEXT_URL_RE = re.compile(r'data-feed-next="([^"]+)"')
+
+
+class FeedFragmentTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='TestAuthor')
+        cls.other = User.objects.create(username='TestOther')
+        cls.reader = User.objects.create(username='TestReader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group',
+            description='Тестовое описание группы'
+        )
+        for i in range(settings.NUMBER_OF_TEST_POSTS):
+            Post.objects.create(
+                text=f'Пост автора {i}', author=cls.author, group=cls.group)
+        Post.objects.create(text='Пост другого автора', author=cls.other)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def scroll(self, client, page):
+        """Тексты постов страницы и всех подгруженных за ней фрагментов."""
+        content = client.get(page).content.decode()
+        texts = POST_TEXT_RE.findall(content)
+        next_url = NEXT_URL_RE.search(content)
+        while next_url:
+            fragment = client.get(next_url[1].replace('&amp;', '&'))
+            content = fragment.content.decode()
+            self.assertNotIn('<html', content)
+            texts += POST_TEXT_RE.findall(content)
+            next_url = NEXT_URL_RE.search(content)
+        return texts
+
+    def test_scroll_loads_whole_feed(self):
+        """Проверяем, что фрагменты после первой страницы каждой ленты
+         выводят остальные ее посты по одному разу."""
+        author_texts = [
+            f'Пост автора {i}'
+            for i in reversed(range(settings.NUMBER_OF_TEST_POSTS))
+        ]
+        feeds = {
+            reverse('posts:index'): ['Пост другого автора'] + author_texts,
+            reverse('posts:group_list', args=[self.group.slug]):
+                author_texts,
+            reverse('posts:profile', args=[self.author.username]):
+                author_texts,
+            reverse('posts:follow_index'): author_texts,
+        }
+        for page, expected in feeds.items():
+            with self.subTest(page=page):
+                self.assertEqual(
+                    self.scroll(self.reader_client, page), expected)
+
+    def test_json_variant(self):
+        """Проверяем JSON-вариант фрагмента."""
+        url = reverse('posts:index_feed')
+        data = self.client.get(url, {'format': 'json'}).json()
+        self.assertIn('Пост другого автора', data['html'])
+        self.assertTrue(data['next'].startswith(url))
+        data = self.client.get(data['next'] + '&format=json').json()
+        self.assertIn('Пост автора', data['html'])
+        self.assertIsNone(data['next'])
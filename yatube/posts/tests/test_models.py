@@ -55,3 +55,37 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     self.post._meta.get_field(field).help_text, expected_value)
+
+
+class PostQuerySetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group',
+            description='Тестовое описание',
+        )
+        for i in range(3):
+            author = User.objects.create(username=f'TestAuthor{i}')
+            Post.objects.create(
+                text=f'Тестовый пост {i}', author=author, group=cls.group)
+
+    def test_feed_loads_authors_and_groups_in_one_query(self):
+        """Проверяем, что поля списка постов читаются одним запросом."""
+        with self.assertNumQueries(1):
+            for post in Post.objects.for_feed():
+                (post.text, post.image, post.created,
+                 post.author.get_full_name(), post.author.username,
+                 post.group.slug)
+
+    def test_edit_does_not_overwrite_unloaded_fields(self):
+        """Проверяем, что сохранение поста из for_edit не затирает
+         незагруженный счетчик комментариев."""
+        post = Post.objects.for_edit().first()
+        Post.objects.filter(pk=post.pk).update(comments_count=5)
+        post.text = 'Новый текст'
+        post.save()
+        post = Post.objects.get(pk=post.pk)
+        self.assertEqual(post.text, 'Новый текст')
+        self.assertEqual(post.comments_count, 5)
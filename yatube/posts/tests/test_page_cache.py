@@ -0,0 +1,200 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils.http import http_date
+
+from core import fragments
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='TestAuthor')
+        cls.reader = User.objects.create(username='TestReader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group',
+            description='Тестовое описание группы'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.author, group=cls.group)
+        cls.pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': cls.author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_repeated_anonymous_request_skips_database(self):
+        """Проверяем, что повторный запрос анонимного посетителя
+         отдается из кэша без обращений к БД и с шапкой."""
+        for page in self.pages:
+            with self.subTest(page=page):
+                response_1 = self.client.get(page)
+                with self.assertNumQueries(0):
+                    response_2 = self.client.get(page)
+                self.assertEqual(response_1.content, response_2.content)
+                self.assertContains(response_2, 'Войти')
+
+    def test_holes_rendered_for_each_visitor(self):
+        """Проверяем, что авторизованный пользователь не получает
+         страницу анонимного посетителя, а тот - его шапку."""
+        profile = self.pages[2]
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.get(profile)
+        response = self.reader_client.get(profile)
+        self.assertContains(response, 'Выйти')
+        self.assertContains(response, 'Отписаться')
+        response = self.client.get(profile)
+        self.assertNotContains(response, 'Выйти')
+        self.assertContains(response, 'Подписаться')
+
+    def test_unknown_params_share_cached_page(self):
+        """Проверяем, что лишние параметры адреса не создают
+         новых записей в кэше, а номер страницы - создает."""
+        index = self.pages[0]
+        self.client.get(index)
+        with self.assertNumQueries(0):
+            self.client.get(index, {'utm_source': 'mail'})
+        self.client.get(index, {'page': 2})
+        with self.assertNumQueries(0):
+            self.client.get(index, {'utm_source': 'mail', 'page': 2})
+
+    def test_stale_fragments_not_cached(self):
+        """Проверяем, что страница с устаревшим фрагментом, который
+         перерисовывает другой запрос, не попадает в кэш страниц."""
+        index = self.pages[0]
+        self.client.get(index)
+        Post.objects.create(text='Новый пост', author=self.author)
+        locked = mock.Mock(wraps=cache, add=mock.Mock(return_value=False))
+        with mock.patch.object(fragments, 'cache', locked):
+            self.assertNotContains(self.client.get(index), 'Новый пост')
+        self.assertContains(self.client.get(index), 'Новый пост')
+
+    def test_writes_invalidate_pages(self):
+        """Проверяем, что новые комментарии и подписки сразу видны
+         анонимному посетителю."""
+        post_detail, profile = self.pages[3], self.pages[2]
+        self.client.get(post_detail)
+        Comment.objects.create(
+            text='Новый комментарий', author=self.reader, post=self.post)
+        self.assertContains(self.client.get(post_detail), 'Новый комментарий')
+        self.assertContains(self.client.get(profile), 'Подписчиков: 0')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertContains(self.client.get(profile), 'Подписчиков: 1')
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='TestAuthor')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group',
+            description='Тестовое описание группы'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.author, group=cls.group)
+        cls.reverse_post_detail = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk})
+        cls.pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': cls.author.username}),
+            cls.reverse_post_detail,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_unchanged_page_not_modified(self):
+        """Проверяем, что при совпадении ETag страница не рисуется
+         и возвращается 304."""
+        for client in (self.client, self.author_client):
+            for page in self.pages:
+                with self.subTest(page=page):
+                    etag = client.get(page)['ETag']
+                    response = client.get(page, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 304)
+                    self.assertEqual(response['ETag'], etag)
+                    self.assertEqual(response.content, b'')
+                    self.assertFalse(response.templates)
+
+    def test_etag_changes_with_data_and_visitor(self):
+        """Проверяем, что ETag меняется после комментария и различается
+         у анонимного и авторизованного посетителя."""
+        etag = self.client.get(self.reverse_post_detail)['ETag']
+        self.assertNotEqual(
+            self.author_client.get(self.reverse_post_detail)['ETag'], etag)
+        Comment.objects.create(
+            text='Комментарий', author=self.author, post=self.post)
+        response = self.client.get(
+            self.reverse_post_detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_changes_with_csrf_token(self):
+        """Проверяем, что после смены CSRF-токена (повторного входа)
+         страница с формой рисуется заново, а не отдается 304."""
+        self.author_client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 64
+        etag = self.author_client.get(self.reverse_post_detail)['ETag']
+        self.author_client.cookies[settings.CSRF_COOKIE_NAME] = 'b' * 64
+        response = self.author_client.get(
+            self.reverse_post_detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_no_etag_with_stale_fragments(self):
+        """Проверяем, что страница с устаревшим фрагментом отдается
+         без ETag и не подтверждается ответом 304."""
+        index = self.pages[0]
+        etag = self.client.get(index)['ETag']
+        Post.objects.create(text='Новый пост', author=self.author)
+        locked = mock.Mock(wraps=cache, add=mock.Mock(return_value=False))
+        with mock.patch.object(fragments, 'cache', locked):
+            response = self.client.get(index)
+        self.assertNotContains(response, 'Новый пост')
+        self.assertNotIn('ETag', response)
+        response = self.client.get(index, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Новый пост')
+
+    def test_no_last_modified(self):
+        """Проверяем, что Last-Modified не выставляется и
+         If-Modified-Since не дает 304 после изменения группы."""
+        response = self.client.get(self.reverse_post_detail)
+        self.assertNotIn('Last-Modified', response)
+        self.group.title = 'Новое название'
+        self.group.save()
+        response = self.client.get(
+            self.reverse_post_detail,
+            HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertContains(response, 'Новое название')
+
+    def test_post_modified_on_edit_and_comment(self):
+        """Проверяем, что дата изменения поста обновляется при
+         редактировании и комментировании."""
+        modified = Post.objects.get(pk=self.post.pk).modified
+        self.author_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Комментарий'})
+        commented = Post.objects.get(pk=self.post.pk).modified
+        self.assertGreater(commented, modified)
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            {'text': 'Отредактированный пост'})
+        self.assertGreater(
+            Post.objects.get(pk=self.post.pk).modified, commented)
@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from posts import feeds
+from posts.models import Post, User
+from posts.utils import CursorPage, FeedPaginator, cursor_paginator, paginator
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestAuthor')
+        Post.objects.bulk_create([
+            Post(text=f'Тестовый пост {i}', author=cls.user)
+            for i in range(settings.NUMBER_OF_TEST_POSTS)
+        ])
+        cls.factory = RequestFactory()
+
+    def setUp(self):
+        cache.clear()
+
+    def get_page(self, **params):
+        request = self.factory.get('/', params)
+        return cursor_paginator(request, Post.objects.all())
+
+    def test_older_pages_walk_whole_feed(self):
+        """Проверяем, что переходы по курсору "older" выводят все посты
+         по одному разу в порядке (created, id)."""
+        page = self.get_page(older='')
+        self.assertFalse(page.has_previous())
+        seen = list(page)
+        while page.has_next():
+            page = self.get_page(older=page.next_cursor)
+            seen.extend(page)
+        expected = list(Post.objects.order_by('-created', '-pk'))
+        self.assertEqual(seen, expected)
+
+    def test_newer_cursor_returns_previous_page(self):
+        """Проверяем, что курсор "newer" возвращает предыдущую страницу."""
+        first_page = self.get_page(older='')
+        second_page = self.get_page(older=first_page.next_cursor)
+        self.assertEqual(
+            len(second_page), settings.POSTS_ON_PAGE_2_TEST)
+        back = self.get_page(newer=second_page.previous_cursor)
+        self.assertEqual(list(back), list(first_page))
+        self.assertFalse(back.has_previous())
+        self.assertTrue(back.has_next())
+
+    def test_cursor_page_runs_single_query(self):
+        """Проверяем, что страница курсора строится без COUNT(*)."""
+        with self.assertNumQueries(1):
+            list(self.get_page(older=''))
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Проверяем, что битый курсор открывает первую страницу."""
+        page = self.get_page(older='not-a-cursor')
+        self.assertEqual(page[0], Post.objects.order_by('-created', '-pk')[0])
+
+    def test_index_switches_to_cursor_mode(self):
+        """Проверяем, что главная страница поддерживает курсорный режим."""
+        response = self.client.get(reverse('posts:index') + '?older=')
+        page_obj = response.context['page_obj']
+        self.assertIsInstance(page_obj, CursorPage)
+        self.assertContains(response, f'?older={page_obj.next_cursor}')
+
+
+class FeedPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='TestAuthor')
+        Post.objects.bulk_create([
+            Post(text=f'Тестовый пост {i}', author=cls.user)
+            for i in range(settings.NUMBER_OF_TEST_POSTS)
+        ])
+        cls.factory = RequestFactory()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def get_paginator(self):
+        request = self.factory.get('/')
+        return paginator(
+            request, Post.objects.all(), feed=feeds.INDEX).paginator
+
+    def test_count_cached_until_feed_changes(self):
+        """Проверяем, что число постов считается один раз до изменения
+         ленты."""
+        self.assertEqual(
+            self.get_paginator().count, settings.NUMBER_OF_TEST_POSTS)
+        with self.assertNumQueries(0):
+            self.get_paginator().count
+        Post.objects.create(text='Новый пост', author=self.user)
+        self.assertEqual(
+            self.get_paginator().count, settings.NUMBER_OF_TEST_POSTS + 1)
+
+    def test_elided_page_range(self):
+        """Проверяем окно номеров страниц вокруг текущей."""
+        pages = FeedPaginator(range(1000), 10)
+        self.assertEqual(
+            list(pages.get_elided_page_range(50)),
+            [1, 2, pages.ELLIPSIS, 47, 48, 49, 50, 51, 52, 53,
+             pages.ELLIPSIS, 99, 100]
+        )
+        self.assertEqual(
+            list(pages.get_elided_page_range(2)),
+            [1, 2, 3, 4, 5, pages.ELLIPSIS, 99, 100]
+        )
+        self.assertEqual(
+            list(FeedPaginator(range(50), 10).get_elided_page_range(3)),
+            [1, 2, 3, 4, 5]
+        )
+
+    @override_settings(POSTS_ON_PAGE=1)
+    def test_navigation_size_does_not_grow(self):
+        """Проверяем, что навигация выводит окно страниц, а не все."""
+        response = self.client.get(reverse('posts:index') + '?page=8')
+        links = response.content.decode().count('class="page-link"')
+        # Первая, предыдущая, 2 + 7 + 2 номера, 2 пропуска,
+        # следующая, последняя.
+        self.assertEqual(links, 17)
@@ -0,0 +1,125 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.query_budget import (
+    TIME_ENV, UPDATE_ENV, QueryBudgetExceeded, load_budgets, normalize,
+    query_budget, save_budgets
+)
+from posts import urls
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group',
+            description='Тестовое описание группы'
+        )
+        authors = [
+            User.objects.create_user(username=f'TestAuthor{i}')
+            for i in range(3)
+        ]
+        cls.author = authors[0]
+        for author in authors:
+            Follow.objects.create(user=cls.user, author=author)
+            for i in range(2):
+                post = Post.objects.create(
+                    text=f'Тестовый пост {i}', author=author,
+                    group=cls.group)
+                Comment.objects.create(
+                    text='Комментарий', author=author, post=post)
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.user, group=cls.group)
+        for author in authors:
+            Comment.objects.create(
+                text='Комментарий', author=author, post=cls.post)
+        cls.post_to_delete = Post.objects.create(
+            text='Пост для удаления', author=cls.user)
+        cls.kwargs = {
+            'post_id': cls.post.pk,
+            'slug': cls.group.slug,
+            'username': cls.author.username,
+        }
+        cls.params = {'search': {'q': 'пост'}}
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def url(self, pattern):
+        kwargs = {
+            name: self.kwargs[name] for name in pattern.pattern.converters}
+        if pattern.name == 'post_delete':
+            kwargs['post_id'] = self.post_to_delete.pk
+        return reverse(f'posts:{pattern.name}', kwargs=kwargs)
+
+    def test_pages_within_query_budget(self):
+        """Проверяем, что каждая страница posts.urls укладывается
+         в бюджет запросов."""
+        for pattern in urls.urlpatterns:
+            with self.subTest(name=pattern.name):
+                url = self.url(pattern)
+                cache.clear()
+                with query_budget(f'posts:{pattern.name}'):
+                    self.client.get(url, self.params.get(pattern.name))
+
+    def test_over_budget_shows_new_queries(self):
+        """Проверяем, что превышение бюджета выводит новые запросы."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'budgets.json')
+        with mock.patch.dict(os.environ, {UPDATE_ENV: '1'}):
+            with query_budget('index', path=path):
+                list(Post.objects.all())
+        with mock.patch.dict(os.environ):
+            os.environ.pop(UPDATE_ENV, None)
+            with self.assertRaises(QueryBudgetExceeded) as context:
+                with query_budget('index', path=path):
+                    list(Post.objects.all())
+                    Group.objects.count()
+        self.assertIn('2 запросов при бюджете 1', str(context.exception))
+        self.assertIn('+SELECT COUNT(*)', str(context.exception))
+
+    def test_savepoint_names_normalized(self):
+        """Проверяем, что имена точек сохранения не попадают в бюджет:
+         они меняются от запуска к запуску."""
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                list(Post.objects.all())
+        sql = [normalize(query['sql']) for query in queries]
+        self.assertIn('SAVEPOINT "?"', sql)
+        self.assertIn('RELEASE SAVEPOINT "?"', sql)
+
+    def test_time_checked_on_request(self):
+        """Проверяем, что время запросов проверяется только
+         с QUERY_BUDGET_TIME=1."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'budgets.json')
+        with mock.patch.dict(os.environ, {UPDATE_ENV: '1'}):
+            with query_budget('index', path=path):
+                list(Post.objects.all())
+        budgets = load_budgets(path)
+        budgets['index']['time'] = -1
+        save_budgets(budgets, path)
+        with mock.patch.dict(os.environ):
+            os.environ.pop(UPDATE_ENV, None)
+            os.environ.pop(TIME_ENV, None)
+            with query_budget('index', path=path):
+                list(Post.objects.all())
+            os.environ[TIME_ENV] = '1'
+            with self.assertRaisesRegex(QueryBudgetExceeded, 'заняли'):
+                with query_budget('index', path=path):
+                    list(Post.objects.all())
@@ -0,0 +1,113 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import query_plans
+from posts.models import Comment, Follow, Group, Post, User
+from posts.utils import CURSOR_NEWER, CURSOR_OLDER, encode_cursor
+
+# Таблицы, проход или сортировка которых в горячих запросах - регрессия.
+HOT_TABLES = ('posts_post', 'posts_comment')
+# Допустимые проблемы: часть запроса и причина.
+ALLOWED = {
+    '"posts_post"."author_id" IN (SELECT': (
+        'Лента подписок собирается из постов нескольких авторов, '
+        'их общий порядок получается только сортировкой. Запрос '
+        'выполняется при промахе кэша ленты (posts.timeline).'
+    ),
+}
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='TestAuthor')
+        cls.reader = User.objects.create(username='TestReader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group',
+            description='Тестовое описание группы'
+        )
+        # Другие авторы и группы: с одной строкой в таблице после
+        # ANALYZE планировщику выгоднее начинать с нее.
+        for i in range(20):
+            Post.objects.create(
+                text=f'Пост другого автора {i}',
+                author=User.objects.create(username=f'TestOther{i}'),
+                group=Group.objects.create(
+                    title=f'Группа {i}', slug=f'group-{i}',
+                    description='Описание группы'))
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group)
+            for i in range(30)
+        ]
+        cls.post = cls.posts[15]
+        for i in range(30):
+            Comment.objects.create(
+                text=f'Комментарий {i}', author=cls.reader, post=cls.post)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        post_cursor = encode_cursor(cls.post)
+        comment_cursor = encode_cursor(cls.post.comments.all()[10])
+        group, username = cls.group.slug, cls.author.username
+        cls.pages = (
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=2',
+            reverse('posts:index') + f'?{CURSOR_OLDER}={post_cursor}',
+            reverse('posts:index') + f'?{CURSOR_NEWER}={post_cursor}',
+            reverse('posts:index_feed') + f'?{CURSOR_OLDER}={post_cursor}',
+            reverse('posts:group_list', args=[group]),
+            reverse('posts:group_list', args=[group]) + '?page=2',
+            reverse('posts:group_feed', args=[group])
+            + f'?{CURSOR_OLDER}={post_cursor}',
+            reverse('posts:profile', args=[username]),
+            reverse('posts:profile', args=[username]) + '?page=2',
+            reverse('posts:profile_feed', args=[username])
+            + f'?{CURSOR_OLDER}={post_cursor}',
+            reverse('posts:post_detail', args=[cls.post.pk]),
+            reverse('posts:post_comments', args=[cls.post.pk])
+            + f'?{CURSOR_OLDER}={comment_cursor}',
+            reverse('posts:follow_index'),
+            reverse('posts:follow_index') + '?page=2',
+            reverse('posts:follow_feed') + f'?{CURSOR_OLDER}={post_cursor}',
+        )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def hot_problems(self, page):
+        """Проблемы планов запросов страницы, кроме допустимых."""
+        # Без кэша страница выполняет все свои запросы.
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.reader_client.get(page)
+        self.assertEqual(response.status_code, 200)
+        report = query_plans.analyze(
+            connection, [query['sql'] for query in queries])
+        return [
+            (problem.detail, sql, plan)
+            for sql, plan, found, suggestions in report
+            for problem in found
+            if problem.table in HOT_TABLES
+            and not any(part in sql for part in ALLOWED)
+        ]
+
+    def test_feeds_use_indexes(self):
+        """Проверяем, что запросы лент не проходят посты и комментарии
+         целиком и не сортируют их во временном B-дереве."""
+        for page in self.pages:
+            with self.subTest(page=page):
+                self.assertEqual(self.hot_problems(page), [])
+
+    def test_feeds_use_indexes_with_statistics(self):
+        """Проверяем то же после ANALYZE: статистика, которую собирает
+         db_maintenance, не должна уводить планы от индексов."""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        for page in self.pages:
+            with self.subTest(page=page):
+                self.assertEqual(self.hot_problems(page), [])
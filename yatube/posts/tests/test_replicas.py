@@ -0,0 +1,124 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connections
+from django.test import Client, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import replicas
+from core.query_budget import capture_queries
+from posts.models import Post, User
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.author = User.objects.create_user(
+            username='TestAuthor', password='password')
+        self.reader = User.objects.create(username='TestReader')
+        Post.objects.create(text='Старый пост', author=self.author)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.profile = reverse(
+            'posts:profile', kwargs={'username': self.author.username})
+
+    def get(self, client, url):
+        """Ответ и число запросов к копии."""
+        with CaptureQueriesContext(connections['replica']) as queries:
+            response = client.get(url)
+        return response, len(queries)
+
+    def test_reads_go_to_fresh_replica(self):
+        """Проверяем, что страницы читаются из копии, только пока она
+         не отстает от основной БД."""
+        response, replica_queries = self.get(self.reader_client, self.profile)
+        self.assertEqual(replica_queries, 0)
+        replicas.refresh('replica')
+        response, replica_queries = self.get(self.reader_client, self.profile)
+        self.assertGreater(replica_queries, 0)
+        self.assertContains(response, 'Старый пост')
+
+    def test_writer_reads_primary_until_refresh(self):
+        """Проверяем, что автор нового поста видит его сразу, остальные
+         продолжают читать копию, а страницы из отстающей копии
+         не остаются в кэше."""
+        replicas.refresh('replica')
+        self.author_client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'})
+        response, replica_queries = self.get(self.reader_client, self.profile)
+        self.assertGreater(replica_queries, 0)
+        self.assertNotContains(response, 'Новый пост')
+        # Фрагмент из отстающей копии не сохранен под новой версией.
+        response, replica_queries = self.get(self.author_client, self.profile)
+        self.assertEqual(replica_queries, 0)
+        self.assertContains(response, 'Новый пост')
+        replicas.refresh('replica')
+        for client in (self.author_client, self.reader_client):
+            with self.subTest(client=client):
+                response, replica_queries = self.get(client, self.profile)
+                self.assertGreater(replica_queries, 0)
+                self.assertContains(response, 'Новый пост')
+
+    def test_login_does_not_disable_replica_for_others(self):
+        """Проверяем, что вход пользователя (запись сессии
+         и last_login) не отключает копию для остальных."""
+        replicas.refresh('replica')
+        self.client.post(
+            reverse('users:login'),
+            {'username': self.author.username, 'password': 'password'})
+        response, replica_queries = self.get(self.reader_client, self.profile)
+        self.assertGreater(replica_queries, 0)
+
+    def test_writes_go_to_primary(self):
+        """Проверяем, что запись и миграции не затрагивают копию."""
+        router = replicas.ReplicaRouter()
+        self.assertEqual(router.db_for_write(Post), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'posts'))
+        self.assertIsNone(router.db_for_read(Post))
+
+    def test_replica_queries_captured(self):
+        """Проверяем, что бюджет запросов учитывает чтения из копии."""
+        replicas.refresh('replica')
+        with capture_queries() as queries, \
+                capture_queries('default') as default_queries, \
+                capture_queries('replica') as replica_queries:
+            self.reader_client.get(self.profile)
+        self.assertGreater(len(replica_queries), 0)
+        self.assertEqual(
+            len(queries), len(default_queries) + len(replica_queries))
+
+    def test_write_marked_after_execution(self):
+        """Проверяем, что запись вне запроса отмечается, когда уже
+         выполнена: обновление копии до нее не считается свежим."""
+        written = []
+
+        def mark_written():
+            written.append(
+                Post.objects.filter(text='Новый пост').exists())
+
+        with mock.patch.object(replicas, 'mark_written', mark_written):
+            Post.objects.create(text='Новый пост', author=self.author)
+        self.assertTrue(written)
+        self.assertTrue(all(written))
+
+
+class ReplicasDisabledTests(TransactionTestCase):
+    def test_no_cache_access_without_replicas(self):
+        """Проверяем, что без копий чтения и записи не обращаются
+         к кэшу за отметками."""
+        author = User.objects.create(username='TestAuthor')
+        client = Client()
+        client.force_login(author)
+        with mock.patch.object(replicas, 'cache') as replicas_cache:
+            client.post(reverse('posts:post_create'), {'text': 'Пост'})
+            client.get(reverse(
+                'posts:profile', kwargs={'username': author.username}))
+            Post.objects.create(text='Еще пост', author=author)
+        self.assertFalse(replicas_cache.method_calls)
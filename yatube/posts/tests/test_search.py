@@ -0,0 +1,92 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import fulltext
+from posts.models import Comment, Post, User
+from posts.stemmer import stem
+
+
+class StemmerTests(TestCase):
+    def test_stem(self):
+        """Проверяем, что словоформы приводятся к одной основе."""
+        words = {
+            'важнейшие': 'важн',
+            'вагонов': 'вагон',
+            'подписался': 'подписа',
+            'прочитавши': 'прочита',
+            'ёлки': 'елк',
+            'Django': 'django',
+        }
+        for word, expected in words.items():
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestAuthor')
+        cls.post_trains = Post.objects.create(
+            text='Поезд из пяти вагонов', author=cls.user)
+        cls.post_programming = Post.objects.create(
+            text='Программирование на Python', author=cls.user)
+        cls.comment = Comment.objects.create(
+            text='Красивые вагоны', author=cls.user, post=cls.post_programming)
+        cls.reverse_search = reverse('posts:search')
+
+    def search(self, query):
+        response = self.client.get(self.reverse_search, {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_finds_word_forms(self):
+        """Проверяем, что поиск находит пост по другой форме слова."""
+        self.assertEqual(self.search('поезда'), [self.post_trains])
+
+    def test_search_ranks_post_text_above_comments(self):
+        """Проверяем, что совпадение в тексте поста выше совпадения
+         в комментарии."""
+        self.assertEqual(
+            self.search('вагон'),
+            [self.post_trains, self.post_programming]
+        )
+
+    def test_prefix_search(self):
+        """Проверяем поиск по началу слова."""
+        self.assertEqual(self.search('прогр*'), [self.post_programming])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Проверяем, что индекс обновляется при изменении
+         и удалении поста."""
+        self.post_trains.text = 'Самолет'
+        self.post_trains.save()
+        self.assertEqual(self.search('поезд'), [])
+        self.assertEqual(self.search('самолеты'), [self.post_trains])
+        self.comment.delete()
+        self.assertEqual(self.search('вагон'), [])
+
+    def test_rebuild_search_index(self):
+        """Проверяем, что команда индексирует посты,
+         созданные в обход моделей."""
+        post = Post.objects.bulk_create(
+            [Post(text='Массовая загрузка', author=self.user)])[0]
+        self.assertEqual(self.search('загрузка'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(
+            fulltext.search_post_ids('загрузки'),
+            [Post.objects.get(text=post.text).pk]
+        )
+
+    def test_admin_search_uses_index(self):
+        """Проверяем, что поиск в админке идет по индексу."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'поезда'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.post_trains])
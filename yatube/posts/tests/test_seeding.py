@@ -0,0 +1,56 @@
+from datetime import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+from django.utils import timezone
+
+from posts import counters, fulltext
+from posts.models import Comment, Follow, Group, Post, User
+from posts.seeding import Seeder
+
+UNTIL = timezone.make_aware(datetime(2022, 1, 1))
+
+
+class SeedTests(TestCase):
+    def seed(self, seed=0):
+        call_command(
+            'seed_yatube', users=20, groups=3, posts=200, comments=300,
+            follows=100, seed=seed, until='2022-01-01', days=30,
+            chunk_size=64, stdout=StringIO()
+        )
+
+    def test_seed_creates_consistent_data(self):
+        """Проверяем, что команда создает записи с верными счетчиками
+         и поисковым индексом."""
+        self.seed()
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertTrue(0 < Follow.objects.count() <= 100)
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        self.assertFalse(counters.missing_stats().exists())
+        self.assertEqual(counters.find_mismatches(), [])
+        post = Post.objects.first()
+        self.assertLessEqual(post.created, UNTIL)
+        self.assertIn(post.pk, fulltext.search_post_ids(post.text))
+
+    def test_seed_is_reproducible(self):
+        """Проверяем, что одинаковый seed дает одинаковые данные."""
+        self.seed(seed=1)
+        first = list(Post.objects.order_by('pk').values_list(
+            'text', 'created'))
+        self.seed(seed=1)
+        second = list(Post.objects.order_by('pk').values_list(
+            'text', 'created'))[len(first):]
+        self.assertEqual(first, second)
+
+    def test_popular_authors_get_more_posts(self):
+        """Проверяем, что посты распределены по авторам неравномерно."""
+        seeder = Seeder(until=UNTIL)
+        author_ids = seeder.users(100)
+        seeder.posts(1000, author_ids, [], author_skew=3.0)
+        top = Post.objects.filter(author_id__in=author_ids[:10]).count()
+        self.assertGreater(top, 1000 // 3)
@@ -0,0 +1,122 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import thumbnails
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create(username='TestAuthor')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.user_author)
+
+    def test_post_create_generates_thumbnails(self):
+        """Проверяем, что миниатюры готовы сразу после создания поста."""
+        self.author_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с картинкой',
+                'image': SimpleUploadedFile(
+                    'small.gif', SMALL_GIF, content_type='image/gif'),
+            }
+        )
+        post = Post.objects.get(text='Пост с картинкой')
+        for geometry, options in settings.POST_THUMBNAILS:
+            with self.subTest(geometry=geometry):
+                self.assertIsNotNone(
+                    thumbnails.backend.get_cached(
+                        post.image, geometry, **options))
+
+    @override_settings(THUMBNAIL_WORKERS=1)
+    def test_placeholder_until_thumbnail_ready(self):
+        """Проверяем, что до готовности миниатюры выводится заглушка."""
+        post = Post.objects.create(
+            text='Пост', author=self.user_author,
+            image=SimpleUploadedFile(
+                'small_2.gif', SMALL_GIF, content_type='image/gif'))
+        thumbnails._pending.add(post.image.name)
+        try:
+            response = self.client.get(
+                reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        finally:
+            thumbnails._pending.discard(post.image.name)
+        self.assertContains(response, 'thumbnail_placeholder.svg')
+        thumbnails.generate(post.image.name)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertNotContains(response, 'thumbnail_placeholder.svg')
+
+    def test_cached_fragments_redrawn_when_thumbnail_ready(self):
+        """Проверяем, что фрагменты и страницы, сохраненные с заглушкой,
+         рисуются заново, когда миниатюра готова."""
+        post = Post.objects.create(
+            text='Пост', author=self.user_author,
+            image=SimpleUploadedFile(
+                'small_3.gif', SMALL_GIF, content_type='image/gif'))
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.user_author.username]),
+        )
+        thumbnails._pending.add(post.image.name)
+        try:
+            for page in pages:
+                self.assertContains(
+                    self.client.get(page), 'thumbnail_placeholder.svg')
+        finally:
+            thumbnails._pending.discard(post.image.name)
+        thumbnails.queue(post.image)
+        for page in pages:
+            with self.subTest(page=page):
+                self.assertNotContains(
+                    self.client.get(page), 'thumbnail_placeholder.svg')
+
+    def test_page_thumbnails_fetched_in_one_query(self):
+        """Проверяем, что записи о миниатюрах всех постов страницы
+         читаются из БД одним запросом."""
+        for i in range(3):
+            post = Post.objects.create(
+                text=f'Пост {i}', author=self.user_author,
+                image=SimpleUploadedFile(
+                    f'page_{i}.gif', SMALL_GIF, content_type='image/gif'))
+            thumbnails.generate(post.image.name)
+        self.client.get(reverse('posts:index'))
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        kvstore_queries = [
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        self.assertNotContains(response, 'thumbnail_placeholder.svg')
@@ -0,0 +1,95 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Follow, Post, User
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user_author = User.objects.create(username='TestAuthor')
+        cls.user_author_2 = User.objects.create(username='TestAuthor2')
+        cls.user_auth = User.objects.create(username='TestAuth')
+        cls.reverse_follow_index = reverse('posts:follow_index')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user_auth)
+        Follow.objects.create(user=self.user_auth, author=self.user_author)
+
+    def get_feed(self):
+        response = self.authorized_client.get(self.reverse_follow_index)
+        return list(response.context['page_obj'])
+
+    def cached_entries(self):
+        return cache.get(timeline._key(self.user_auth.pk))
+
+    def test_new_post_fanned_out_to_built_timeline(self):
+        """Проверяем, что новый пост попадает в уже построенную ленту."""
+        self.get_feed()
+        post = Post.objects.create(text='Новый пост', author=self.user_author)
+        self.assertEqual(self.cached_entries()[0][1], post.pk)
+        self.assertEqual(self.get_feed(), [post])
+
+    def test_follow_backfills_and_unfollow_purges(self):
+        """Проверяем, что подписка дополняет ленту постами автора,
+         а отписка удаляет их."""
+        post = Post.objects.create(text='Пост', author=self.user_author_2)
+        self.get_feed()
+        Follow.objects.create(user=self.user_auth, author=self.user_author_2)
+        self.assertIn(post.pk, [pk for _, pk, _ in self.cached_entries()])
+        Follow.objects.filter(
+            user=self.user_auth, author=self.user_author_2).delete()
+        self.assertNotIn(post.pk, [pk for _, pk, _ in self.cached_entries()])
+        self.assertEqual(self.get_feed(), [])
+
+    def test_deleted_post_purged_from_timeline(self):
+        """Проверяем, что удаленный пост пропадает из ленты."""
+        post = Post.objects.create(text='Пост', author=self.user_author)
+        self.assertEqual(self.get_feed(), [post])
+        post.delete()
+        self.assertEqual(self.cached_entries(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_pull_author_merged_on_read(self):
+        """Проверяем, что посты популярного автора не рассылаются,
+         а подмешиваются в ленту при чтении."""
+        self.get_feed()
+        post = Post.objects.create(text='Пост', author=self.user_author)
+        self.assertEqual(self.cached_entries(), [])
+        self.assertEqual(self.get_feed(), [post])
+
+    @override_settings(TIMELINE_LENGTH=12)
+    def test_pages_past_cached_timeline_read_from_db(self):
+        """Проверяем, что страницы старше обрезанной ленты в кэше
+         выводятся из БД, а не повторяют последнюю страницу."""
+        posts = [
+            Post.objects.create(text=f'Пост {i}', author=self.user_author)
+            for i in range(25)
+        ][::-1]
+        self.get_feed()
+        self.assertEqual(len(self.cached_entries()), 12)
+        response = self.authorized_client.get(
+            self.reverse_follow_index + '?page=3')
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.num_pages, 3)
+        self.assertEqual(list(page_obj), posts[20:])
+
+    @override_settings(TIMELINE_LENGTH=12)
+    def test_truncated_timeline_counted_by_author_counters(self):
+        """Проверяем, что число постов обрезанной ленты берется
+         из счетчиков авторов, без COUNT по постам подписок."""
+        for i in range(25):
+            Post.objects.create(text=f'Пост {i}', author=self.user_author)
+        self.get_feed()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(self.reverse_follow_index)
+        self.assertEqual(response.context['page_obj'].paginator.count, 25)
+        self.assertFalse(
+            [query for query in queries if 'COUNT(' in query['sql']])
@@ -3,16 +3,20 @@ import tempfile
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
+from django.core.cache import cache
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django import forms
 
+from posts import counters
 from posts.models import Comment, Follow, Post, Group, User
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+# Миниатюры создаются в потоке запроса: поток пула мог бы
+# пережить удаление TEMP_MEDIA_ROOT.
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostPagesTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -93,6 +97,10 @@ class PostPagesTests(TestCase):
         cls.authorized_client = Client()
         cls.authorized_client.force_login(cls.user_auth)
 
+        # Посты созданы bulk_create, без сигналов: счетчики постов
+        # не обновлены, а версии лент в кэше устарели.
+        counters.rebuild()
+        cache.clear()
         cls.response_index = cls.author_client.get(cls.reverse_index)
         cls.response_group_list = cls.author_client.get(cls.reverse_group_list)
         cls.response_profile = cls.author_client.get(cls.reverse_profile)
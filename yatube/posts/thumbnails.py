@@ -0,0 +1,226 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+Миниатюры всех размеров из POST_THUMBNAILS создаются сразу после
+загрузки картинки, а не при первом показе страницы. Картинки,
+поставленные в очередь во время запроса, обрабатываются после отправки
+ответа: в том же потоке или, при THUMBNAIL_WORKERS > 0, пулом потоков.
+Создание файла не обращается к БД; запись о готовой миниатюре
+в хранилище sorl делает первый запрос, который ее покажет. Пока файла
+нет, шаблоны выводят заглушку. Готовые миниатюры увеличивают версии
+лент поста, чтобы сохраненные с заглушкой фрагменты и страницы
+нарисовались заново.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core import replicas
+
+from . import feeds
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+_request = threading.local()
+
+
+class PregeneratedThumbnailBackend(ThumbnailBackend):
+    """Разделяет создание файла миниатюры и запись о ней в хранилище."""
+
+    def prepare(self, file_, geometry_string, options):
+        """Исходник и файл миниатюры с теми же именем и параметрами,
+        что вычисляет ThumbnailBackend.get_thumbnail."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return source, ImageFile(name, default.storage)
+
+    def get_cached(self, file_, geometry_string, **options):
+        """Готовая миниатюра или None. Не создает файл."""
+        source, thumbnail = self.prepare(file_, geometry_string, options)
+        cached = default.kvstore.get(thumbnail)
+        if cached:
+            return cached
+        if not thumbnail.exists():
+            return None
+        default.kvstore.get_or_set(source)
+        default.kvstore.set(thumbnail, source)
+        return thumbnail
+
+    def create_file(self, file_, geometry_string, **options):
+        """Создает файл миниатюры, не обращаясь к БД."""
+        source, thumbnail = self.prepare(file_, geometry_string, options)
+        if thumbnail.exists():
+            return
+        source_image = default.engine.get_image(source)
+        try:
+            options['image_info'] = default.engine.get_image_info(
+                source_image)
+            self._create_thumbnail(
+                source_image, geometry_string, options, thumbnail)
+            self._create_alternative_resolutions(
+                source_image, geometry_string, options, thumbnail.name)
+        finally:
+            default.engine.cleanup(source_image)
+
+
+backend = PregeneratedThumbnailBackend()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails'
+            )
+        return _executor
+
+
+def generate(name, feed_names=()):
+    """Создает файлы миниатюр всех размеров для картинки name
+    и увеличивает версии лент feed_names, где она выводится."""
+    try:
+        if not default_storage.exists(name):
+            logger.debug('Картинка %s не найдена', name)
+            return
+        for geometry, options in settings.POST_THUMBNAILS:
+            backend.create_file(name, geometry, **options)
+        feeds.bump(*feed_names)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', name)
+    finally:
+        with _lock:
+            _pending.discard(name)
+
+
+def _dispatch(name, feed_names):
+    if settings.THUMBNAIL_WORKERS:
+        _get_executor().submit(generate, name, feed_names)
+    else:
+        generate(name, feed_names)
+
+
+def start_request():
+    _request.deferred = []
+    _request.placeholders = False
+
+
+def finish_request():
+    """Обрабатывает очередь запроса после отправки ответа."""
+    deferred = getattr(_request, 'deferred', None)
+    _request.deferred = None
+    for name, feed_names in deferred or ():
+        _dispatch(name, feed_names)
+
+
+def queue(image):
+    """Ставит картинку в очередь на создание миниатюр.
+    Вне запроса миниатюры создаются сразу."""
+    if not image:
+        return
+    name = image.name
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    # Ленты вычисляются сейчас: потоки пула не обращаются к БД.
+    post = getattr(image, 'instance', None)
+    feed_names = feeds.post_feeds(post) if post is not None else []
+    deferred = getattr(_request, 'deferred', None)
+    if deferred is not None:
+        deferred.append((name, feed_names))
+    else:
+        _dispatch(name, feed_names)
+
+
+def _prefetch_key(geometry, options):
+    return geometry, tuple(sorted(options.items()))
+
+
+def _get_many_raw(raw_keys):
+    """Значения хранилища sorl по списку ключей: один запрос к кэшу
+    и не больше одного запроса к БД."""
+    kvstore = default.kvstore
+    empty = cached_db_kvstore.EMPTY_VALUE
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        return {key: kvstore._get_raw(key) for key in raw_keys}
+    values = kvstore.cache.get_many(raw_keys)
+    missing = [key for key in raw_keys if key not in values]
+    if missing:
+        found = dict(KVStoreModel.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        # Отстающая копия может не знать о готовых миниатюрах.
+        if not replicas.lagging():
+            kvstore.cache.set_many(
+                {key: found.get(key, empty) for key in missing},
+                thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+        values.update(found)
+    return {
+        key: value for key, value in values.items()
+        if value is not None and value != empty
+    }
+
+
+def prefetch(posts):
+    """Загружает записи о миниатюрах всех постов страницы разом.
+    Результат сохраняется в post.image и используется get_ready."""
+    wanted = {}
+    for post in posts:
+        if not post.image:
+            continue
+        post.image.ready_thumbnails = {}
+        for geometry, options in settings.POST_THUMBNAILS:
+            _, thumbnail = backend.prepare(post.image, geometry, dict(options))
+            wanted[add_prefix(thumbnail.key)] = (
+                post.image, _prefetch_key(geometry, options))
+    if not wanted:
+        return
+    values = _get_many_raw(list(wanted))
+    for raw_key, (image, key) in wanted.items():
+        value = values.get(raw_key)
+        image.ready_thumbnails[key] = (
+            deserialize_image_file(value) if value else None)
+
+
+def get_ready(image, geometry, **options):
+    """Готовая миниатюра или None. Отсутствующая миниатюра
+    ставится в очередь."""
+    if not image:
+        return None
+    prefetched = getattr(image, 'ready_thumbnails', {}).get(
+        _prefetch_key(geometry, options))
+    if prefetched is not None:
+        return prefetched
+    thumbnail = backend.get_cached(image, geometry, **options)
+    if thumbnail is None:
+        _request.placeholders = True
+        queue(image)
+    return thumbnail
+
+
+def placeholders_shown():
+    """Выводились ли в текущем запросе заглушки вместо миниатюр."""
+    return getattr(_request, 'placeholders', False)
@@ -0,0 +1,166 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Лента пользователя хранится в кэше как отсортированный по убыванию список
+записей (created, id, author_id) длиной не больше TIMELINE_LENGTH.
+Новый пост рассылается в уже построенные ленты подписчиков, отсутствующая
+лента строится из БД при первом чтении. Посты авторов, у которых больше
+TIMELINE_FANOUT_LIMIT подписчиков, не рассылаются, а подмешиваются
+в ленту при чтении.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+
+from core import replicas
+
+from .models import Follow, Post, UserStats
+from .utils import CURSOR_NEWER, CURSOR_OLDER, FeedPaginator, paginator
+
+TIMELINE_KEY = 'timeline:{user_id}'
+
+
+def _key(user_id):
+    return TIMELINE_KEY.format(user_id=user_id)
+
+
+def _latest_entries(post_list):
+    rows = post_list.order_by('-created', '-pk').values_list(
+        'created', 'pk', 'author')[:settings.TIMELINE_LENGTH]
+    return [(created.timestamp(), pk, author) for created, pk, author in rows]
+
+
+def _merge(*entry_lists):
+    merged = set().union(*entry_lists)
+    return sorted(merged, reverse=True)[:settings.TIMELINE_LENGTH]
+
+
+def _update_cached(user_ids, update):
+    """Применяет update к уже построенным лентам пользователей."""
+    timelines = cache.get_many([_key(user_id) for user_id in user_ids])
+    if timelines:
+        cache.set_many(
+            {key: update(entries) for key, entries in timelines.items()},
+            settings.TIMELINE_TIMEOUT
+        )
+
+
+def _followers(author_id):
+    return Follow.objects.filter(author_id=author_id).values_list(
+        'user', flat=True)
+
+
+def following_posts(user):
+    """Посты авторов, на которых подписан пользователь."""
+    return Post.objects.for_feed().filter(
+        author__in=Follow.objects.filter(user=user).values('author'))
+
+
+def is_pull_author(author_id):
+    """Посты автора с большим числом подписчиков не рассылаются."""
+    return UserStats.objects.filter(
+        pk=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).exists()
+
+
+def pull_authors(user):
+    """Авторы из подписок пользователя, посты которых
+    подмешиваются в ленту при чтении."""
+    return list(
+        UserStats.objects.filter(
+            user__following__user=user,
+            followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+        ).values_list('pk', flat=True)
+    )
+
+
+def following_count(user):
+    """Число постов в подписках по счетчикам авторов, без подсчета
+    самих постов."""
+    return UserStats.objects.filter(
+        user__following__user=user
+    ).aggregate(total=Sum('posts_count'))['total'] or 0
+
+
+def get_entries(user):
+    """Лента пользователя: из кэша или построенная из БД."""
+    entries = cache.get(_key(user.pk))
+    if entries is None:
+        entries = _latest_entries(following_posts(user))
+        # Лента из отстающей копии не получила бы пропущенные посты:
+        # рассылка уже прошла.
+        if not replicas.lagging():
+            cache.set(_key(user.pk), entries, settings.TIMELINE_TIMEOUT)
+    pulled = pull_authors(user)
+    if pulled:
+        entries = _merge(
+            entries, _latest_entries(Post.objects.filter(author__in=pulled)))
+    return entries
+
+
+def get_page(request, user):
+    """Страница ленты подписок. В курсорном режиме и за пределами
+    ленты в кэше читает из БД."""
+    if CURSOR_OLDER in request.GET or CURSOR_NEWER in request.GET:
+        return paginator(request, following_posts(user))
+    entries = get_entries(user)
+    entries_paginator = FeedPaginator(entries, settings.POSTS_ON_PAGE)
+    if len(entries) >= settings.TIMELINE_LENGTH:
+        # Лента в кэше обрезана: общее число постов - по счетчикам
+        # авторов, более старые страницы берутся из БД.
+        entries_paginator.count = following_count(user)
+    page_obj = entries_paginator.get_page(request.GET.get('page'))
+    if page_obj.end_index() > len(entries):
+        posts_paginator = FeedPaginator(
+            following_posts(user).order_by('-created', '-pk'),
+            settings.POSTS_ON_PAGE)
+        posts_paginator.count = entries_paginator.count
+        return posts_paginator.page(page_obj.number)
+    posts = Post.objects.for_feed().in_bulk(
+        [pk for _, pk, _ in page_obj.object_list])
+    # Запись в ленте действительна, только если пост с этим id
+    # существует и создан в то же время.
+    page_obj.object_list = [
+        posts[pk] for created, pk, _ in page_obj.object_list
+        if pk in posts and posts[pk].created.timestamp() == created
+    ]
+    return page_obj
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    if is_pull_author(post.author_id):
+        return
+    entry = (post.created.timestamp(), post.pk, post.author_id)
+    _update_cached(
+        _followers(post.author_id), lambda entries: _merge(entries, [entry]))
+
+
+def purge_post(post):
+    """Удаляет пост из лент подписчиков автора."""
+    if is_pull_author(post.author_id):
+        return
+    _update_cached(
+        _followers(post.author_id),
+        lambda entries: [entry for entry in entries if entry[1] != post.pk]
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты нового автора из подписок."""
+    _update_cached(
+        [user_id],
+        lambda entries: _merge(
+            entries,
+            _latest_entries(Post.objects.filter(author_id=author_id))
+        )
+    )
+
+
+def purge_author(user_id, author_id):
+    """Удаляет из ленты посты автора, от которого отписались."""
+    _update_cached(
+        [user_id],
+        lambda entries: [
+            entry for entry in entries if entry[2] != author_id]
+    )
@@ -1,9 +1,185 @@
+import base64
+from collections.abc import Sequence
+
 from django.conf import settings
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from . import feeds
+
+CURSOR_OLDER = 'older'
+CURSOR_NEWER = 'newer'
+
+
+class FeedPaginator(Paginator):
+    """Paginator с числом записей из кэша ленты feed (см. feeds.get_count)
+    или готовым числом count и сокращенным списком номеров страниц."""
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, feed=None, count=None,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.feed = feed
+        if count is not None:
+            self.count = count
+
+    @cached_property
+    def count(self):
+        if self.feed is None:
+            return super().count
+        return feeds.get_count(self.feed, lambda: Paginator.count.func(self))
+
+    def get_elided_page_range(self, number=1, *, on_each_side=3, on_ends=2):
+        """Номера страниц вокруг number и по краям, пропуски обозначены
+        ELLIPSIS. Повторяет метод Paginator из Django 3.2."""
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < self.num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(
+                self.num_pages - on_ends + 1, self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
 
 
-def paginator(request, post_list):
-    paginator = Paginator(post_list, settings.POSTS_ON_PAGE)
+def paginator(request, post_list, feed=None, count=None):
+    """Постраничный вывод. При наличии курсора в запросе -
+    курсорный режим без подсчета общего числа записей. Общее число
+    записей - count (например, счетчик группы или автора) или число
+    ленты feed из кэша."""
+    if CURSOR_OLDER in request.GET or CURSOR_NEWER in request.GET:
+        return cursor_paginator(request, post_list)
+    paginator = FeedPaginator(
+        post_list, settings.POSTS_ON_PAGE, feed=feed, count=count)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
+
+
+def ids_paginator(request, ids, post_list):
+    """Постраничный вывод заранее упорядоченного списка id.
+    Из БД загружаются только записи текущей страницы."""
+    paginator = FeedPaginator(ids, settings.POSTS_ON_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    posts = post_list.in_bulk(page_obj.object_list)
+    page_obj.object_list = [
+        posts[pk] for pk in page_obj.object_list if pk in posts]
+    return page_obj
+
+
+def encode_cursor(obj):
+    """Кодирует ключ (created, id) записи в строку для адресной строки."""
+    raw = f'{obj.created.isoformat()}~{obj.pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Раскодирует курсор. Для пустого или битого курсора вернет None."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        created, pk = raw.decode().rsplit('~', 1)
+        created = parse_datetime(created)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if created is None:
+        return None
+    return created, pk
+
+
+class CursorPage(Sequence):
+    """Страница курсорной пагинации.
+    Повторяет интерфейс Page, которым пользуются шаблоны."""
+    is_cursor = True
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<CursorPage {self.previous_cursor}..{self.next_cursor}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return encode_cursor(self.object_list[0])
+        return None
+
+
+def cursor_paginator(request, post_list, per_page=None):
+    """Курсорная (keyset) пагинация по ключу (created, id).
+    Не выполняет COUNT(*) и OFFSET: каждая страница - один запрос
+    по индексу, независимо от глубины прокрутки."""
+    per_page = per_page or settings.POSTS_ON_PAGE
+    older = decode_cursor(request.GET.get(CURSOR_OLDER))
+    newer = decode_cursor(request.GET.get(CURSOR_NEWER))
+    if newer is not None:
+        created, pk = newer
+        object_list = list(
+            post_list.filter(
+                Q(created__gt=created) | Q(created=created, pk__gt=pk)
+            ).order_by('created', 'pk')[:per_page + 1]
+        )
+        has_previous = len(object_list) > per_page
+        object_list = object_list[:per_page][::-1]
+        return CursorPage(object_list, has_next=True,
+                          has_previous=has_previous)
+    post_list = post_list.order_by('-created', '-pk')
+    if older is not None:
+        created, pk = older
+        post_list = post_list.filter(
+            Q(created__lt=created) | Q(created=created, pk__lt=pk))
+    object_list = list(post_list[:per_page + 1])
+    return CursorPage(object_list[:per_page],
+                      has_next=len(object_list) > per_page,
+                      has_previous=older is not None)
+
+
+def next_page_url(page_obj, url_name, *args):
+    """Адрес фрагмента url_name со следующими постами после page_obj
+    (обычной или курсорной страницы) или None, если их нет."""
+    if not page_obj.has_next() or not len(page_obj):
+        return None
+    if getattr(page_obj, 'is_cursor', False):
+        cursor = page_obj.next_cursor
+    else:
+        cursor = encode_cursor(page_obj[-1])
+    query = urlencode({CURSOR_OLDER: cursor})
+    return f'{reverse(url_name, args=args)}?{query}'
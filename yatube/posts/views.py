@@ -1,32 +1,55 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
 
+from core.replicas import read_from_replica
+
+from . import feeds, fulltext, thumbnails, timeline
 from .forms import PostForm, CommentForm
-from .models import Follow, Group, Post, User
-from .utils import paginator
+from .models import Comment, Follow, Group, Post, User
+from .page_cache import cache_anonymous_page, conditional_page, depends_on
+from .utils import cursor_paginator, ids_paginator, next_page_url, paginator
 
 
+@conditional_page
+@cache_anonymous_page
+@read_from_replica
 def index(request):
-    post_list = Post.objects.select_related('author')
-    page_obj = paginator(request, post_list)
+    depends_on(request, feeds.INDEX)
+    post_list = Post.objects.for_feed()
+    page_obj = paginator(request, post_list, feed=feeds.INDEX)
     return render(request,
                   'posts/index.html',
                   {'page_obj': page_obj})
 
 
+@conditional_page
+@cache_anonymous_page
+@read_from_replica
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = paginator(request, post_list)
+    depends_on(request, feeds.group_feed(group.pk))
+    post_list = group.posts.for_feed()
+    page_obj = paginator(request, post_list, count=group.posts_count)
     return render(request,
                   'posts/group_list.html',
                   {'group': group, 'page_obj': page_obj})
 
 
+@conditional_page
+@cache_anonymous_page
+@read_from_replica
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    page_obj = paginator(request, post_list)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    depends_on(request, feeds.profile_feed(author.pk),
+               feeds.followers_feed(author.pk))
+    post_list = author.posts.for_feed()
+    page_obj = paginator(request, post_list,
+                         count=author.stats.posts_count)
     following = (request.user.is_authenticated) and (
         request.user != author) and Follow.objects.filter(
         user=request.user, author=author).exists()
@@ -37,22 +60,104 @@ def profile(request, username):
                    'following': following})
 
 
+def feed_fragment(request, post_list, url_name, *args):
+    """Следующие посты ленты без остальной страницы, для подгрузки
+    при прокрутке. С ?format=json - HTML постов и адрес следующей
+    порции в JSON."""
+    page_obj = cursor_paginator(request, post_list)
+    next_url = next_page_url(page_obj, url_name, *args)
+    html = render_to_string(
+        'posts/includes/feed_fragment.html',
+        {'page_obj': page_obj, 'next_url': next_url}, request)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'html': html, 'next': next_url})
+    return HttpResponse(html)
+
+
+@conditional_page
+@cache_anonymous_page
+@read_from_replica
+def index_feed(request):
+    depends_on(request, feeds.INDEX)
+    return feed_fragment(
+        request, Post.objects.for_feed(), 'posts:index_feed')
+
+
+@conditional_page
+@cache_anonymous_page
+@read_from_replica
+def group_feed(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    depends_on(request, feeds.group_feed(group.pk))
+    return feed_fragment(
+        request, group.posts.for_feed(), 'posts:group_feed', slug)
+
+
+@conditional_page
+@cache_anonymous_page
+@read_from_replica
+def profile_feed(request, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    depends_on(request, feeds.profile_feed(author.pk))
+    return feed_fragment(
+        request, author.posts.for_feed(), 'posts:profile_feed', username)
+
+
+@conditional_page
+@cache_anonymous_page
+@read_from_replica
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.for_detail(), id=post_id)
+    # Профиль - из-за числа постов автора, группа - из-за ее названия.
+    depends_on(request, feeds.post_feed(post.pk),
+               feeds.profile_feed(post.author_id),
+               *([feeds.group_feed(post.group_id)] if post.group_id else []),
+               modified=post.modified)
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    comments = comments_page(request, post.pk)
     return render(request,
                   'posts/post_detail.html',
                   {'post': post, 'form': form, 'comments': comments})
 
 
+def comments_page(request, post_id):
+    comment_list = Comment.objects.filter(
+        post_id=post_id).select_related('author')
+    return cursor_paginator(
+        request, comment_list, per_page=settings.COMMENTS_ON_PAGE)
+
+
+def post_comments(request, post_id):
+    """Следующая страница комментариев без остальной страницы поста."""
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments = comments_page(request, post_id)
+    return render(request,
+                  'posts/includes/comments.html',
+                  {'post_id': post_id, 'comments': comments})
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = ids_paginator(
+        request,
+        fulltext.search_post_ids(query),
+        Post.objects.for_feed()
+    )
+    return render(request,
+                  'posts/search.html',
+                  {'query': query, 'page_obj': page_obj})
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.queue(post.image)
         return redirect('posts:profile', post.author.username)
     return render(request,
                   'posts/create_post.html',
@@ -60,14 +165,17 @@ def post_create(request):
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    if request.user != post.author:
+    post = get_object_or_404(
+        Post.objects.for_edit(*PostForm.Meta.fields), id=post_id)
+    if request.user.pk != post.author_id:
         return redirect('posts:post_detail', post_id=post_id)
     form = PostForm(request.POST or None, files=request.FILES or None,
                     instance=post)
     if form.is_valid():
-        form.save()
+        post = form.save()
+        thumbnails.queue(post.image)
         return redirect('posts:post_detail', post_id=post_id)
     return render(request,
                   'posts/create_post.html',
@@ -75,17 +183,19 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def post_delete(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    if request.user != post.author:
+    post = get_object_or_404(Post.objects.for_edit(), id=post_id)
+    if request.user.pk != post.author_id:
         return redirect('posts:post_detail', post_id=post_id)
     post.delete()
     return redirect('posts:profile', username=request.user.username)
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.for_edit(), id=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -96,17 +206,21 @@ def add_comment(request, post_id):
 
 
 @login_required
+@read_from_replica
 def follow_index(request):
-    follow_list = Follow.objects.select_related('user').filter(
-        user=request.user)
-    author_list = follow_list.values('author')
-    post_list = Post.objects.select_related('author').filter(
-        author__in=author_list)
-    page_obj = paginator(request, post_list)
+    page_obj = timeline.get_page(request, request.user)
     return render(request, 'posts/follow.html', {'page_obj': page_obj})
 
 
 @login_required
+@read_from_replica
+def follow_feed(request):
+    return feed_fragment(
+        request, timeline.following_posts(request.user), 'posts:follow_feed')
+
+
+@login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = User.objects.get(username=username)
     if request.user != author:
@@ -115,6 +229,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     follower = Follow.objects.filter(user=request.user, author=author).all()
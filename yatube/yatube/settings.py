@@ -53,6 +53,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.ProfilingMiddleware",
+    "core.middleware.ReplicaMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -98,9 +100,52 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
-    }
+        # Соединение живет между запросами потока: прагмы ниже
+        # выполняются один раз, а не на каждый запрос.
+        "CONN_MAX_AGE": 60,
+    },
+    # Копия для чтения, см. core.replicas.
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.path.join(BASE_DIR, "db.replica.sqlite3"),
+        "CONN_MAX_AGE": 60,
+    },
 }
 
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+# Копии, в которые read_from_replica направляет чтения, и как часто
+# обновлять их из основной БД (0 - не обновлять; клиент читает копию,
+# только если она снята после его последней записи). Пустой список -
+# все идет в default; копию из DATABASES включают, вписав ее сюда,
+# вместе с REPLICA_REFRESH_INTERVAL или внешним обновлением.
+DATABASE_REPLICAS = []
+REPLICA_REFRESH_INTERVAL = 0
+
+# Прагмы каждого нового соединения с SQLite (core.signals). В режиме
+# WAL читатели не ждут писателя, а писатель - читателей; synchronous
+# NORMAL в этом режиме не теряет целостность при сбое, только последние
+# транзакции. busy_timeout - сколько миллисекунд ждать, пока допишет
+# другой процесс; он идет первым, чтобы смена режима журнала тоже
+# ждала блокировку. mmap_size и journal_size_limit (до скольких байт
+# обрезается WAL после контрольной точки) в байтах, cache_size < 0 -
+# в КиБ. auto_vacuum действует только на новую БД, см. core.maintenance.
+SQLITE_PRAGMAS = {
+    'busy_timeout': 20000,
+    'auto_vacuum': 'INCREMENTAL',
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+    'journal_size_limit': 64 * 1024 * 1024,
+}
+
+# Обслуживание БД (core.maintenance): как часто запускать его в фоне
+# после запросов (0 - только командой db_maintenance) и сколько секунд
+# может занимать каждый шаг.
+DB_MAINTENANCE_INTERVAL = 0
+DB_MAINTENANCE_SLICE = 0.2
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -146,6 +191,41 @@ LENGH_OF_TEXT = 15
 POSTS_ON_PAGE = 10
 POSTS_ON_PAGE_2_TEST = 5
 NUMBER_OF_TEST_POSTS = POSTS_ON_PAGE + POSTS_ON_PAGE_2_TEST
+COMMENTS_ON_PAGE = 20
+
+# Лента подписок: длина, время жизни в кэше и число подписчиков автора,
+# начиная с которого его посты подмешиваются при чтении, а не рассылаются.
+TIMELINE_LENGTH = 800
+TIMELINE_TIMEOUT = 60 * 60 * 24
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Размеры миниатюр картинок постов, которые используют шаблоны,
+# и число потоков, создающих их в фоне. При 0 миниатюры создаются
+# в потоке запроса после отправки ответа.
+POST_THUMBNAILS = [
+    ('960x339', {'crop': 'center', 'upscale': True}),
+]
+THUMBNAIL_WORKERS = 2
+
+# Профилирование запросов: доля замеряемых запросов (0 - выключено),
+# как часто каждый процесс сбрасывает свою статистику в файл и куда,
+# через сколько секунд без обновления файл процесса удаляется.
+PROFILING_SAMPLE_RATE = 0.05
+PROFILING_FLUSH_INTERVAL = 10
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiling')
+PROFILING_SNAPSHOT_MAX_AGE = 60 * 60 * 24
+
+# Сколько хранится страница, сохраненная для анонимных посетителей.
+# Изменения данных сбрасывают ее раньше, через версии лент.
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Кэш фрагментов страниц: сколько устаревший фрагмент еще выдается,
+# пока его перерисовывает другой запрос, и сколько ждать этой перерисовки.
+FRAGMENT_STALE_TIMEOUT = 300
+FRAGMENT_LOCK_TIMEOUT = 10
+
+# Наибольшее число результатов полнотекстового поиска.
+SEARCH_RESULTS_LIMIT = 1000
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -158,8 +238,27 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Тесты пишут файлы во временный каталог, см. core.testing.
+TEST_RUNNER = 'core.testing.TestRunner'
+
+# Частые ключи читаются из памяти процесса, остальные - из кэша
+# в файле SQLite, общего для всех процессов на машине. Файл лежит
+# в каталоге проекта, а не в общем /tmp: значения раскрываются pickle.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.backends.tiered_cache.TieredCache',
+        'LOCATION': 'default',
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 5,
+            'SYNC_INTERVAL': 0.5,
+            'SHARED': {
+                'BACKEND': 'core.backends.sqlite_cache.SQLiteCache',
+                'LOCATION': os.path.join(BASE_DIR, 'cache', 'cache.sqlite3'),
+                'OPTIONS': {
+                    'MAX_ENTRIES': 100000,
+                },
+            },
+        },
     }
 }